@@ -0,0 +1,83 @@
+#  Copyright (c) 2019 Kurt Rinnert <kurt.rinnert@cern.ch>
+#
+#  _design.py (this file) is part of  PWFML.
+#
+#  PWFML is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  PWFML is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PWFML.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Design matrix helpers shared by the model modules.
+
+Only numpy is imported, so the modules using these helpers do not pull in
+statsmodels or sklearn on import.
+"""
+import numpy as np
+
+
+def constant_columns(X):
+    """Return mask of the non-zero constant columns, as in sm.add_constant()."""
+    if hasattr(X, 'tocsr'):
+        low = X.min(axis=0).toarray().ravel()
+        high = X.max(axis=0).toarray().ravel()
+        return (low == high) & (low != 0)
+    if len(X) == 0:
+        return np.zeros(X.shape[1], dtype=bool)
+    return (np.ptp(X, axis=0) == 0) & (X[0] != 0)
+
+
+def design(X, fit_intercept):
+    """Return X as 2-dimensional float array, with a leading column of ones.
+
+    The column of ones is only added if fit_intercept is True and X has no
+    constant column yet.
+    """
+    A = np.asarray(X, dtype=float)
+    if A.ndim == 1:
+        A = A[:, None]
+    if fit_intercept and not constant_columns(A).any():
+        A = np.column_stack([np.ones(len(A)), A])
+    return A
+
+
+def orthopoly(x, degree):
+    """Return the orthonormal polynomial basis of x and its transformation.
+
+    x is standardised and the (n x degree+1) Vandermonde matrix V of the
+    standardised values is factorised as V = QR.  The first d+1 columns of Q
+    span the polynomials of degree d, including the constant.  Return Q, R
+    and the centre and scale of the standardisation, new points z map onto
+    the basis as V(z) R^-1.
+    """
+    x = np.asarray(x, dtype=float).ravel()
+    centre, scale = x.mean(), x.std()
+    Q, R = np.linalg.qr(np.vander((x - centre) / scale, degree + 1, increasing=True))
+    return Q, R, centre, scale
+
+
+def scaled_cholesky(gram):
+    """Return the Cholesky factor of the equilibrated Gram matrix and the scale.
+
+    The rows and columns are scaled to a unit diagonal before factorising,
+    gram = S L L' S with S = diag(scale).  The leading d x d blocks of L and
+    S factorise the leading block of gram.  Raise LinAlgError if gram is not
+    positive definite.
+    """
+    scale = np.sqrt(np.diag(gram))
+    scale[scale == 0] = 1
+    return np.linalg.cholesky(gram / np.outer(scale, scale)), scale
+
+
+def scaled_cho_solve(factor, scale, b):
+    """Solve gram x = b with the factor and scale of scaled_cholesky()."""
+    from scipy import linalg
+
+    return linalg.cho_solve((factor, True), b / scale) / scale
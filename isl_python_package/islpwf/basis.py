@@ -0,0 +1,182 @@
+#  Copyright (c) 2019 Kurt Rinnert <kurt.rinnert@cern.ch>
+#
+#  basis.py (this file) is part of  PWFML.
+#
+#  PWFML is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  PWFML is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PWFML.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Polynomial and spline bases for degree and knot sweeps.
+
+A BasisCache builds the bases of one predictor once.  The orthonormal
+polynomial basis of the highest degree requested so far serves all lower
+degrees as column slices.  Spline bases with quantile knots, as built by
+patsy's bs() and cr() with df, are not nested, they are cached per df.
+
+An IncrementalQR fit adds columns to the design one at a time with QR
+updates, so the fits of all nested designs, e.g. splines with knots added
+one by one, cost about one fit.
+"""
+import numpy as np
+import pandas as pd
+from scipy import linalg
+
+from islpwf._design import orthopoly
+
+
+class IncrementalQR:
+    """Least squares fit of y that grows by columns.
+
+    add() orthogonalises new columns against the current orthonormal basis
+    (classical Gram-Schmidt with one reorthogonalisation) and extends the R
+    factor.  rss_ holds the residual sum of squares after every column, the
+    first entry is the one of the empty design.
+    """
+    def __init__(self, y):
+        self.y = np.asarray(y, dtype=float).ravel()
+        self.Q = np.empty((len(self.y), 0))
+        self.R = np.empty((0, 0))
+        self.qy = np.empty(0)
+        self.rss_ = [self.y @ self.y]
+
+    def add(self, columns):
+        A = np.asarray(columns, dtype=float).reshape(len(self.y), -1)
+        k = self.Q.shape[1]
+        Q = np.empty((len(self.y), k + A.shape[1]))
+        Q[:, :k] = self.Q
+        R = np.zeros((k + A.shape[1],) * 2)
+        R[:k, :k] = self.R
+        qy = np.empty(k + A.shape[1])
+        qy[:k] = self.qy
+
+        for j, a in enumerate(A.T, start=k):
+            r = Q[:, :j].T @ a
+            v = a - Q[:, :j] @ r
+            s = Q[:, :j].T @ v
+            v -= Q[:, :j] @ s
+            norm = np.linalg.norm(v)
+            if norm <= 1e-10 * np.linalg.norm(a):
+                raise np.linalg.LinAlgError(f'column {j} is linearly dependent on the design')
+            Q[:, j] = v / norm
+            R[:j, j] = r + s
+            R[j, j] = norm
+            qy[j] = Q[:, j] @ self.y
+            self.rss_.append(self.rss_[-1] - qy[j]**2)
+
+        self.Q, self.R, self.qy = Q, R, qy
+        return self
+
+    def coef(self, k=None):
+        """Return the coefficients of the fit on the first k columns (default: all)."""
+        k = self.Q.shape[1] if k is None else k
+        return linalg.solve_triangular(self.R[:k, :k], self.qy[:k])
+
+    def fitted(self, k=None):
+        """Return the fitted values of the fit on the first k columns (default: all)."""
+        k = self.Q.shape[1] if k is None else k
+        return self.Q[:, :k] @ self.qy[:k]
+
+
+class BasisCache:
+    """Polynomial and spline bases of the predictor x, built once.
+
+    poly() returns the orthonormal polynomial basis, constant first, spline()
+    the patsy spline designs, intercept first.  Both evaluate the basis
+    learned on x at new points if x is given, e.g. for prediction grids.
+    """
+    def __init__(self, x):
+        self.x = np.asarray(x, dtype=float).ravel()
+        self._poly = None
+        self._splines = {}
+
+    def poly(self, degree, x=None):
+        """Return the (n x degree+1) orthonormal polynomial basis."""
+        if self._poly is None or self._poly[0] < degree:
+            self._poly = (degree,) + orthopoly(self.x, degree)
+
+        _, Q, R, centre, scale = self._poly
+        if x is None:
+            return Q[:, :degree + 1]
+
+        V = np.vander((np.asarray(x, dtype=float).ravel() - centre) / scale, degree + 1, increasing=True)
+        return linalg.solve_triangular(R[:degree + 1, :degree + 1], V.T, trans='T').T
+
+    def spline(self, df, kind='bs', degree=3, x=None):
+        """Return the patsy design of a bs() or cr() spline with df degrees of freedom.
+
+        The cr() basis is centred, so that it is not collinear with the
+        intercept.
+        """
+        import patsy
+
+        key = (kind, df, degree)
+        if key not in self._splines:
+            if kind == 'bs':
+                formula = f'bs(x, df={df}, degree={degree}, include_intercept=False)'
+            elif kind == 'cr':
+                formula = f"cr(x, df={df}, constraints='center')"
+            else:
+                raise ValueError(f"kind must be 'bs' or 'cr', not {kind!r}")
+            design = patsy.dmatrix(formula, {'x': self.x})
+            self._splines[key] = (np.asarray(design), design.design_info)
+
+        design, info = self._splines[key]
+        if x is None:
+            return design
+
+        return np.asarray(patsy.build_design_matrices([info], {'x': np.asarray(x, dtype=float).ravel()})[0])
+
+    def _sweep(self, y, rss, index):
+        tss = ((y - y.mean())**2).sum()
+        rss = np.asarray(rss)
+        return pd.DataFrame({'rss': rss, 'r2': 1 - rss / tss}, index=index)
+
+    def poly_sweep(self, y, degrees=10):
+        """Fit polynomials of degree 1 to degrees.
+
+        The nested fits follow from the projections of y on the orthonormal
+        basis.  Return data frame of rss and r2 indexed by degree.
+        """
+        y = np.asarray(y, dtype=float).ravel()
+        qy = self.poly(degrees).T @ y
+        rss = y @ y - np.cumsum(qy**2)
+        return self._sweep(y, rss[1:], pd.RangeIndex(1, degrees + 1, name='degree'))
+
+    def spline_sweep(self, y, dfs, kind='bs', degree=3):
+        """Fit splines with every number of degrees of freedom in dfs.
+
+        Return data frame of rss and r2 indexed by df.
+        """
+        y = np.asarray(y, dtype=float).ravel()
+        rss = []
+        for df in dfs:
+            design = self.spline(df, kind, degree)
+            resid = y - design @ np.linalg.lstsq(design, y, rcond=None)[0]
+            rss.append(resid @ resid)
+        return self._sweep(y, rss, pd.Index(list(dfs), name='df'))
+
+    def knot_sweep(self, y, knots, degree=3):
+        """Fit regression splines with the knots added one at a time.
+
+        The splines are fitted in the truncated power basis, which grows by
+        one column per knot, with an IncrementalQR.  The fit with the first
+        k knots spans the same space as bs(x, knots=knots[:k], degree).
+        Return data frame of rss and r2 indexed by the number of knots.
+        """
+        y = np.asarray(y, dtype=float).ravel()
+        centre, scale = self.x.mean(), self.x.std()
+        z = (self.x - centre) / scale
+        fit = IncrementalQR(y).add(np.vander(z, degree + 1, increasing=True))
+        for knot in knots:
+            fit.add(np.maximum(z - (knot - centre) / scale, 0)**degree)
+        rss = fit.rss_[degree + 2:]
+        return self._sweep(y, rss, pd.RangeIndex(1, len(knots) + 1, name='knots'))
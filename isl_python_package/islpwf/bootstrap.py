@@ -0,0 +1,177 @@
+#  Copyright (c) 2019 Kurt Rinnert <kurt.rinnert@cern.ch>
+#
+#  bootstrap.py (this file) is part of  PWFML.
+#
+#  PWFML is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  PWFML is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PWFML.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Bootstrap standard errors and confidence intervals.
+
+The resamples are drawn in bulk as (resamples x n) index matrices from one
+seeded generator, so the results only depend on the seed and batch_size,
+not on the number of workers.  The built-in statistics are evaluated for a
+whole batch of resamples at once from the multinomial resampling weights:
+
+    'mean'  the column means of the data
+    'ols'   the least squares coefficients of y on X, intercept first
+
+Any other statistic is a callable that is called with the resampled data
+arrays, e.g. alpha(x, y), and is evaluated one resample at a time, in a
+process pool if workers is given.
+"""
+from collections import namedtuple
+import numpy as np
+
+from islpwf._design import design
+
+BootstrapResult = namedtuple('BootstrapResult', ['estimate', 'std_error', 'ci', 'replicates'])
+
+
+def _take(data, index):
+    if hasattr(data, 'iloc'):
+        return data.iloc[index]
+    return np.asarray(data)[index]
+
+
+def _apply(statistic, data, indices):
+    """Evaluate statistic on the resamples given by the rows of indices."""
+    return np.array([np.ravel(statistic(*[_take(d, index) for d in data])) for index in indices])
+
+
+def _counts(indices, n):
+    """Return the (resamples x n) multinomial counts of the index matrix."""
+    rows = np.arange(len(indices))[:, None] * n
+    return np.bincount((rows + indices).ravel(), minlength=len(indices) * n).reshape(len(indices), n)
+
+
+def _ols(X, y, weights=None):
+    """Return the (weighted) least squares coefficients, batched over weights."""
+    if weights is None:
+        return np.linalg.lstsq(X, y, rcond=None)[0]
+    xtw = X.T[None, :, :] * weights[:, None, :]
+    return np.linalg.solve(xtw @ X, (xtw @ y)[:, :, None])[:, :, 0]
+
+
+def _jackknife(statistic, data, workers):
+    """Return the (n x k) leave-one-out estimates of the statistic."""
+    if statistic == 'mean':
+        x, = data
+        return (x.sum(axis=0) - x) / (len(x) - 1)
+
+    if statistic == 'ols':
+        X, y = data
+        params = _ols(X, y)
+        q, r = np.linalg.qr(X)
+        leverage = np.einsum('ij,ij->i', q, q)
+        resid = y - X @ params
+        # beta_(i) = beta - (X'X)^-1 x_i e_i / (1 - h_ii)
+        shift = np.linalg.solve(r, q.T).T * (resid / (1 - leverage))[:, None]
+        return params - shift
+
+    n = len(data[0])
+    indices = [np.delete(np.arange(n), i) for i in range(n)]
+    return _run(statistic, data, indices, workers)
+
+
+def _run(statistic, data, indices, workers, batch_size=100):
+    if workers is None or workers <= 1:
+        return _apply(statistic, data, indices)
+
+    from concurrent import futures
+
+    with futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = [pool.submit(_apply, statistic, data, indices[start:start + batch_size])
+                for start in range(0, len(indices), batch_size)]
+        return np.vstack([job.result() for job in jobs])
+
+
+def _bca(estimate, replicates, jackknife, alpha):
+    from scipy.stats import norm
+
+    below = (replicates < estimate).mean(axis=0)
+    below = np.clip(below, 1 / (len(replicates) + 1), 1 - 1 / (len(replicates) + 1))
+    z0 = norm.ppf(below)
+    d = jackknife.mean(axis=0) - jackknife
+    a = (d**3).sum(axis=0) / (6 * ((d**2).sum(axis=0))**1.5)
+
+    ci = np.empty((2, len(estimate)))
+    for i, z in enumerate(norm.ppf([alpha / 2, 1 - alpha / 2])):
+        q = norm.cdf(z0 + (z0 + z) / (1 - a * (z0 + z)))
+        ci[i] = [np.quantile(replicates[:, j], q[j]) for j in range(len(estimate))]
+    return ci
+
+
+def bootstrap(statistic, *data, n_boot=1000, ci='percentile', alpha=0.05, seed=None,
+              batch_size=None, workers=None, fit_intercept=True):
+    """Bootstrap the statistic of data.
+
+    statistic is 'mean' (one data array), 'ols' (data X and y, with an
+    intercept if fit_intercept is True) or a callable taking the data
+    arrays and returning a number or an array.  The n_boot resamples are
+    drawn in batches of batch_size (default: about 10 million indices, or
+    design matrix entries for 'ols', per batch).
+
+    ci is 'percentile' or 'bca' (bias-corrected and accelerated) for
+    (1 - alpha) confidence intervals.  BCa intervals need the jackknife
+    estimates, i.e. n more evaluations of callable statistics.
+
+    Return BootstrapResult with the estimate on the data, the bootstrap
+    standard error, the (2 x ...) array of the lower and upper interval
+    bounds and the (n_boot x ...) array of bootstrap replicates.
+    """
+    if ci not in ('percentile', 'bca'):
+        raise ValueError(f"ci must be 'percentile' or 'bca', not {ci!r}")
+
+    if statistic == 'mean':
+        x, = data
+        data = (np.asarray(x, dtype=float),)
+        estimate = data[0].mean(axis=0)
+    elif statistic == 'ols':
+        X, y = data
+        data = (design(X, fit_intercept), np.asarray(y, dtype=float))
+        estimate = _ols(*data)
+    elif callable(statistic):
+        estimate = np.asarray(statistic(*data))
+    else:
+        raise ValueError(f"statistic must be 'mean', 'ols' or a callable, not {statistic!r}")
+
+    n = len(data[0])
+    if batch_size is None:
+        # the 'ols' batches hold a weighted copy of X per resample
+        width = data[0].shape[1] if statistic == 'ols' else 1
+        batch_size = max(1, 10000000 // (n * width))
+    rng = np.random.default_rng(seed)
+
+    replicates = []
+    for start in range(0, n_boot, batch_size):
+        indices = rng.integers(0, n, size=(min(batch_size, n_boot - start), n))
+        if statistic == 'mean':
+            replicates.append(_counts(indices, n) @ data[0].reshape(n, -1) / n)
+        elif statistic == 'ols':
+            replicates.append(_ols(*data, weights=_counts(indices, n).astype(float)))
+        else:
+            replicates.append(_run(statistic, data, indices, workers))
+    replicates = np.vstack(replicates)
+
+    flat = np.ravel(estimate)
+    if ci == 'bca':
+        jackknife = _jackknife(statistic, data, workers).reshape(n, -1)
+        bounds = _bca(flat, replicates, jackknife, alpha)
+    else:
+        bounds = np.quantile(replicates, [alpha / 2, 1 - alpha / 2], axis=0)
+
+    shape = np.shape(estimate)
+    return BootstrapResult(estimate,
+                           replicates.std(axis=0, ddof=1).reshape(shape),
+                           bounds.reshape((2,) + shape),
+                           replicates.reshape((n_boot,) + shape))
@@ -0,0 +1,150 @@
+#  Copyright (c) 2019 Kurt Rinnert <kurt.rinnert@cern.ch>
+#
+#  cv.py (this file) is part of  PWFML.
+#
+#  PWFML is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  PWFML is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PWFML.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Cross-validation of least squares fits without refitting.
+
+The leave-one-out errors of a linear model follow from a single fit through
+the hat-matrix identity
+
+    y_i - yhat_(-i) = (y_i - yhat_i) / (1 - h_ii),
+
+the k-fold fits are solved from the full Gram matrix X'X with the rows of
+the held out fold subtracted.  The results agree with cross_val_score() over
+SMWrapper(sm.OLS) or LinearRegression with the same folds and the
+neg_mean_squared_error scoring.  The design must have full column rank.
+
+The fits of nested designs, e.g. polynomials of increasing degree, share one
+factorisation, so poly_cv() evaluates a sweep over all degrees in one pass.
+"""
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from scipy import linalg
+
+from islpwf._design import design, orthopoly, scaled_cho_solve, scaled_cholesky
+
+CVResult = namedtuple('CVResult', ['mse', 'fold_mse'])
+
+
+def _splits(n, folds, shuffle, random_state):
+    from sklearn.model_selection import KFold
+
+    cv = KFold(n_splits=folds, shuffle=shuffle, random_state=random_state if shuffle else None)
+    return [test for _, test in cv.split(np.empty((n, 1)))]
+
+
+def _loo(A, y, sizes):
+    """Return (sizes x n) array of squared leave-one-out errors.
+
+    The first d columns of the orthonormal factor Q of A span the first d
+    columns of A, so the fits and leverages of all nested designs follow
+    from one QR decomposition.
+    """
+    Q = np.linalg.qr(A)[0]
+    qy = Q.T @ y
+    errors = np.empty((len(sizes), len(y)))
+    for i, d in enumerate(sizes):
+        Qd = Q[:, :d]
+        resid = y - Qd @ qy[:d]
+        leverage = np.einsum('ij,ij->i', Qd, Qd)
+        errors[i] = (resid / (1 - leverage))**2
+    return errors
+
+
+def _kfold(A, y, tests, sizes):
+    """Return (sizes x folds) array of fold mean squared errors.
+
+    The Gram matrix of every training set is downdated from the full one and
+    factorised once, the nested designs use the leading blocks of the factor.
+    """
+    gram = A.T @ A
+    xty = A.T @ y
+    errors = np.empty((len(sizes), len(tests)))
+    for j, test in enumerate(tests):
+        At, yt = A[test], y[test]
+        g = gram - At.T @ At
+        b = xty - At.T @ yt
+        try:
+            factor, scale = scaled_cholesky(g)
+        except np.linalg.LinAlgError:
+            factor = None
+        for i, d in enumerate(sizes):
+            if factor is None:
+                params = linalg.lstsq(g[:d, :d], b[:d])[0]
+            else:
+                params = scaled_cho_solve(factor[:d, :d], scale[:d], b[:d])
+            errors[i, j] = np.mean((yt - At[:, :d] @ params)**2)
+    return errors
+
+
+def loocv(X, y, fit_intercept=True):
+    """Leave-one-out cross-validation of the least squares fit of y on X.
+
+    Return CVResult with the mean squared error and the array of squared
+    leave-one-out errors of all observations.
+    """
+    A = design(X, fit_intercept)
+    errors = _loo(A, np.asarray(y, dtype=float), [A.shape[1]])[0]
+    return CVResult(errors.mean(), errors)
+
+
+def kfold_cv(X, y, folds=10, shuffle=True, random_state=None, fit_intercept=True):
+    """K-fold cross-validation of the least squares fit of y on X.
+
+    The folds are those of sklearn's KFold(folds, shuffle, random_state).
+
+    Return CVResult with the mean of the fold mean squared errors and the
+    array of the fold mean squared errors.
+    """
+    A = design(X, fit_intercept)
+    tests = _splits(len(A), folds, shuffle, random_state)
+    errors = _kfold(A, np.asarray(y, dtype=float), tests, [A.shape[1]])[0]
+    return CVResult(errors.mean(), errors)
+
+
+def poly_basis(x, degree):
+    """Return (n x degree+1) orthonormal polynomial basis of x.
+
+    The first d+1 columns span the polynomials of degree d, including the
+    constant.
+    """
+    return orthopoly(x, degree)[0]
+
+
+def poly_cv(x, y, degrees=10, folds=None, shuffle=True, random_state=None):
+    """Cross-validate polynomial fits of y on x of degree 1 to degrees.
+
+    All degrees are evaluated from one basis and, per fold, one
+    factorisation.  If folds is None leave-one-out cross-validation is done,
+    otherwise k-fold cross-validation as in kfold_cv().
+
+    Return CVResult with the series of mean squared errors and the data
+    frame of the fold errors, both indexed by degree.  The fold errors of
+    leave-one-out cross-validation are the squared errors of the
+    observations.
+    """
+    A = poly_basis(x, degrees)
+    y = np.asarray(y, dtype=float)
+    sizes = list(range(2, degrees + 2))
+    if folds is None:
+        errors = _loo(A, y, sizes)
+    else:
+        errors = _kfold(A, y, _splits(len(A), folds, shuffle, random_state), sizes)
+
+    index = pd.RangeIndex(1, degrees + 1, name='degree')
+    fold_mse = pd.DataFrame(errors, index=index)
+    return CVResult(fold_mse.mean(axis=1).rename('mse'), fold_mse)
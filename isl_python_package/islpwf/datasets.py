@@ -15,10 +15,76 @@
 #  You should have received a copy of the GNU General Public License
 #  along with PWFML.  If not, see <https://www.gnu.org/licenses/>.
 #
+"""
+Datasets for Introduction to Statistical Learning.
+
+Every dataset is returned by the function of the same name, for example
+Auto().  All loaders accept the following keyword arguments:
+
+    use_cache   serve the data frames from the shared LRU cache (see
+                cache_info())
+    columns     list of columns to return
+    rows        slice or (start, stop) pair of row positions to return
+    compact     return compact column types (see compact_frame())
+
+Single data frame datasets also accept where, a boolean query expression on
+the columns such as 'mpg > 20', in the syntax of DataFrame.query().  Selections read only the requested data from
+table format HDF entries and memory-mapped column files.
+"""
+import numpy as np
 import pandas as pd
 import os
-
-_datafile = os.path.join(os.path.dirname(__file__), 'isldata.h5')
+import json
+import time
+import atexit
+import threading
+from concurrent import futures
+from collections import OrderedDict, namedtuple
+
+_datafile = os.environ.get('ISLPWF_DATAFILE',
+                           os.path.join(os.path.dirname(__file__), 'isldata.h5'))
+_npydir = os.environ.get('ISLPWF_NPYDIR',
+                         os.path.join(os.path.dirname(__file__), 'isldata'))
+
+# Registry of dataset names and the keys of the HDF store entries that make up
+# each dataset.  Datasets with more than one entry are returned as tuples.
+_registry = {
+    'Advertising': ('Advertising',),
+    'Auto': ('Auto',),
+    'Boston': ('Boston',),
+    'Caravan': ('Caravan',),
+    'Carseats': ('Carseats',),
+    'Credit': ('Credit',),
+    'College': ('College',),
+    'Default': ('Default',),
+    'Hitters': ('Hitters',),
+    'Khan': ('Khan_xtrain', 'Khan_ytrain', 'Khan_xtest', 'Khan_ytest'),
+    'NCI60': ('NCI60_data', 'NCI60_labs'),
+    'OJ': ('OJ',),
+    'Portfolio': ('Portfolio',),
+    'Smarket': ('Smarket',),
+    'USArrests': ('USArrests',),
+    'Wage': ('Wage',),
+    'Weekly': ('Weekly',),
+    'Digits': ('DigitsTrain', 'DigitsTest'),
+}
+
+_backends = ('hdf5', 'npy')
+_backend = os.environ.get('ISLPWF_BACKEND', 'hdf5')
+
+_lock = threading.RLock()
+_stores = {}
+
+_cache = OrderedDict()
+_cache_maxbytes = 512 * 1024**2
+_cache_currbytes = 0
+_cache_hits = 0
+_cache_misses = 0
+
+# HDF store entries holding responses, selected columns are not applied to them.
+_label_keys = {'Khan_ytrain', 'Khan_ytest', 'NCI60_labs'}
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxbytes', 'currbytes', 'entries'])
 
 def HDFFilePath():
     """
@@ -26,8 +92,696 @@ def HDFFilePath():
     """
     return _datafile
 
-_advertising_ds = None
-def Advertising(use_cache=False):
+def NPYDirPath():
+    """
+    Return path to directory containing the memory-mapped column files.
+    """
+    return _npydir
+
+def names():
+    """
+    Return list of the names of all available datasets.
+    """
+    return list(_registry)
+
+def _open_store(datafile=None):
+    """
+    Return the shared read-only handle of datafile, opening it on first use.
+
+    The default datafile is HDFFilePath().  The handle is reopened if it was
+    closed or if we are running in a forked child process, since HDF5 file
+    handles must not be shared across forks.
+    """
+    if datafile is None:
+        datafile = _datafile
+    store, pid = _stores.get(datafile, (None, None))
+    if store is None or not store.is_open or pid != os.getpid():
+        store = pd.HDFStore(datafile, 'r')
+        _stores[datafile] = (store, os.getpid())
+        # register after PyTables so that we close the handles before it does
+        atexit.unregister(close_store)
+        atexit.register(close_store)
+    return store
+
+def close_store():
+    """
+    Close the shared store handles.
+
+    The handles are reopened automatically by the next dataset access.
+    """
+    with _lock:
+        for store, pid in _stores.values():
+            if pid == os.getpid():
+                store.close()
+        _stores.clear()
+
+def set_backend(backend):
+    """
+    Select the storage backend used by the dataset loaders.
+
+    Supported backends are 'hdf5' (default), the compressed HDF file, and
+    'npy', uncompressed column files that are memory-mapped on load (see
+    export_npy()).  The initial backend can be set with the ISLPWF_BACKEND
+    environment variable.
+    """
+    global _backend
+    if backend not in _backends:
+        raise ValueError(f'unknown backend {backend!r}, expected one of {_backends}')
+    with _lock:
+        _backend = backend
+
+def _write_npy(df, directory):
+    """
+    Write data frame to directory as uncompressed column files.
+
+    Numeric columns of the same dtype are stored as the rows of a single
+    (columns x rows) array, so every column is one contiguous run on disk and
+    wide tables map as one block.  Other columns are stored as integer codes
+    with the categories kept in the schema.  The schema, column names and
+    index are written to 'schema.json'.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    blocks = {}
+    columns = []
+    for pos, (name, col) in enumerate(df.items()):
+        values = col.to_numpy()
+        if values.dtype.kind in 'biuf':
+            members = blocks.setdefault(values.dtype.str, [])
+            columns.append({'name': name, 'block': values.dtype.str, 'row': len(members)})
+            members.append(values)
+        else:
+            codes, categories = pd.factorize(col)
+            fname = f'c{pos}.npy'
+            np.save(os.path.join(directory, fname), codes.astype(np.int32))
+            columns.append({'name': name, 'file': fname, 'dtype': str(col.dtype),
+                            'categories': categories.tolist()})
+
+    block_files = {}
+    for num, (dtype, members) in enumerate(blocks.items()):
+        fname = f'b{num}.npy'
+        np.save(os.path.join(directory, fname), np.vstack(members))
+        block_files[dtype] = fname
+    for column in columns:
+        if 'block' in column:
+            column['file'] = block_files[column.pop('block')]
+
+    if df.index.equals(pd.RangeIndex(len(df))):
+        index = None
+    else:
+        index = 'index.npy'
+        np.save(os.path.join(directory, index), df.index.to_numpy())
+
+    schema = {'nrows': len(df), 'index': index, 'columns': columns}
+    with open(os.path.join(directory, 'schema.json'), 'w') as f:
+        json.dump(schema, f)
+
+def _read_npy(key, columns=None):
+    """
+    Return data frame for key from the memory-mapped column files.
+
+    The files are mapped copy-on-write: pages are shared between processes and
+    modifications of the data frame never reach the files.  If columns is not
+    None only the files holding these columns are mapped.
+    """
+    directory = os.path.join(_npydir, key)
+    with open(os.path.join(directory, 'schema.json')) as f:
+        schema = json.load(f)
+
+    maps = {}
+    def _map(fname):
+        if fname not in maps:
+            path = os.path.join(directory, fname)
+            maps[fname] = np.load(path, mmap_mode='c').view(np.ndarray)
+        return maps[fname]
+
+    nrows = schema['nrows']
+    if schema['index'] is None:
+        index = pd.RangeIndex(nrows)
+    else:
+        index = _map(schema['index'])
+
+    selected = schema['columns']
+    if columns is not None:
+        lookup = {column['name']: column for column in selected}
+        selected = [lookup[name] for name in columns]
+
+    names = [column['name'] for column in selected]
+    files = {column['file'] for column in selected}
+    if len(files) == 1 and 'row' in selected[0]:
+        # single numeric block: wrap it without splitting it into columns
+        block = _map(files.pop())
+        if columns is not None:
+            block = block[[column['row'] for column in selected]]
+        return pd.DataFrame(block.T, index=index, columns=names, copy=False)
+
+    data = {}
+    for column in selected:
+        if 'row' in column:
+            data[column['name']] = _map(column['file'])[column['row']]
+        else:
+            codes = _map(column['file'])
+            data[column['name']] = pd.Categorical.from_codes(
+                codes, column['categories']).astype(column['dtype'])
+    return pd.DataFrame(data, index=index, columns=names, copy=False)
+
+def export_npy(directory=None, keys=None, hdf_file=None):
+    """
+    Export datasets from the HDF file to memory-mapped column files.
+
+    Each HDF store entry is written to its own subdirectory of directory
+    (default: NPYDirPath()).  If keys is None all entries are exported.  The
+    entries are read from hdf_file if given and from HDFFilePath() otherwise.
+    Afterwards the files can be used with set_backend('npy').
+    """
+    if directory is None:
+        directory = _npydir
+
+    def _export(store):
+        for key in keys or [key.lstrip('/') for key in store.keys()]:
+            _write_npy(store[key], os.path.join(directory, key))
+
+    if hdf_file is None:
+        with _lock:
+            _export(_open_store())
+    else:
+        with pd.HDFStore(hdf_file, 'r') as store:
+            _export(store)
+
+def _nbytes(df):
+    """Return the memory footprint of a data frame in bytes."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+def _cache_get(key):
+    global _cache_hits, _cache_misses
+    try:
+        df = _cache[key][0]
+    except KeyError:
+        _cache_misses += 1
+        return None
+    _cache.move_to_end(key)
+    _cache_hits += 1
+    return df
+
+def _copy_on_write():
+    """Return True if pandas copy-on-write mode is enabled."""
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    return pd.get_option('mode.copy_on_write') is True
+
+def _share(df):
+    """
+    Return a copy of a cached data frame for a caller.
+
+    In copy-on-write mode pandas tracks the references to the shared buffers
+    and a shallow copy suffices, otherwise the caller gets a deep copy.
+    """
+    return df.copy(deep=not _copy_on_write())
+
+def _cache_put(key, df):
+    global _cache_currbytes
+    nbytes = _nbytes(df)
+    if nbytes > _cache_maxbytes:
+        return
+    if key in _cache:
+        _cache_currbytes -= _cache.pop(key)[1]
+    _cache[key] = (df, nbytes)
+    _cache_currbytes += nbytes
+    _cache_evict()
+
+def _cache_evict():
+    """Evict least recently used entries until the cache fits."""
+    global _cache_currbytes
+    while _cache and _cache_currbytes > _cache_maxbytes:
+        _, (_, evicted) = _cache.popitem(last=False)
+        _cache_currbytes -= evicted
+
+def cache_info():
+    """
+    Return cache statistics.
+
+    The statistics are returned as a named tuple with the number of cache hits
+    and misses, the maximum and current cache size in bytes and the number of
+    cached entries.  Only loads with use_cache=True are counted.
+    """
+    with _lock:
+        return CacheInfo(_cache_hits, _cache_misses, _cache_maxbytes,
+                         _cache_currbytes, len(_cache))
+
+def cache_clear():
+    """
+    Clear the cache and the cache statistics.
+    """
+    global _cache_currbytes, _cache_hits, _cache_misses
+    with _lock:
+        _cache.clear()
+        _cache_currbytes, _cache_hits, _cache_misses = 0, 0, 0
+
+def set_cache_size(maxbytes):
+    """
+    Set the maximum total size of the cached data frames in bytes.
+
+    Least recently used entries are evicted until the cache fits.  Data frames
+    larger than the cache are never cached.
+    """
+    global _cache_maxbytes
+    with _lock:
+        _cache_maxbytes = int(maxbytes)
+        _cache_evict()
+
+def _row_range(rows):
+    """Return (start, stop) for a row selection given as slice or pair."""
+    if rows is None:
+        return None, None
+    if isinstance(rows, slice):
+        if rows.step not in (None, 1):
+            raise ValueError('row selections must be contiguous')
+        return rows.start, rows.stop
+    start, stop = rows
+    return start, stop
+
+def _subset(df, columns=None, start=None, stop=None, where=None):
+    """Apply a row range, query and column projection to a data frame."""
+    if start is not None or stop is not None:
+        df = df.iloc[start:stop]
+    if where is not None:
+        df = df.query(where)
+    if columns is not None:
+        df = df[list(columns)]
+    return df
+
+def _read_subset(key, columns, start, stop, where, datafile=None):
+    """
+    Return a selection of the data frame stored under key.
+
+    Table format HDF entries and column files are queried on disk, so only the
+    requested rows and columns are read.  For fixed format HDF entries only
+    the row range is applied on disk.  If datafile is given the entry is read
+    from that HDF file, whatever the backend.
+
+    Queries that PyTables cannot evaluate, e.g. with backquoted column names
+    or method calls, are applied with DataFrame.query() after reading the row
+    range, so every backend accepts the same expressions.
+    """
+    if _backend == 'npy' and datafile is None:
+        df = _read_npy(key, columns=columns if where is None else None)
+        return _subset(df, columns if where is not None else None, start, stop, where)
+    store = _open_store(datafile)
+    if store.get_storer(key).is_table:
+        try:
+            return store.select(key, where=where, columns=columns, start=start, stop=stop)
+        except (ValueError, TypeError, NotImplementedError):
+            if where is None:
+                raise
+    return _subset(store.select(key, start=start, stop=stop), columns, where=where)
+
+def _compact_dtype(col):
+    """Return the compact dtype for a data frame column."""
+    kind = col.dtype.kind
+    if kind == 'f':
+        return np.dtype(np.float32)
+    if kind in 'iu':
+        lo, hi = col.min(), col.max()
+        for dtype in (np.int8, np.int16, np.int32, np.int64):
+            if np.iinfo(dtype).min <= lo and hi <= np.iinfo(dtype).max:
+                return np.dtype(dtype)
+    if kind == 'O':
+        return 'category'
+    return col.dtype
+
+def compact_frame(df):
+    """
+    Return copy of data frame with compact column types.
+
+    Floating point columns are converted to float32, integer columns to the
+    smallest integer type holding all their values and string columns to
+    categoricals.  The number of bytes saved is stored in the attribute
+    attrs['nbytes_saved'] of the returned data frame.
+
+    Note that arithmetic on small integer types can overflow, convert the
+    columns back to wider types before computing with them if necessary.
+    """
+    groups = {}
+    for name, col in df.items():
+        groups.setdefault(_compact_dtype(col), []).append(name)
+
+    # convert groups of columns at once to keep wide tables in a single block
+    parts = [df[names].astype(dtype) for dtype, names in groups.items()]
+    if len(parts) == 1:
+        out = parts[0]
+    else:
+        out = pd.concat(parts, axis=1)[df.columns]
+    out.attrs['nbytes_saved'] = _nbytes(df) - _nbytes(out)
+    return out
+
+def _read(key, use_cache, columns=None, rows=None, where=None, compact=False,
+          datafile=None):
+    """
+    Return the data frame stored under key, from the cache if allowed.
+
+    Selections are served from the cache if the full data frame is cached and
+    read from disk otherwise.  They are never cached themselves.  Compact data
+    frames are cached separately from the original ones.
+
+    Callers never change the cache: in pandas copy-on-write mode they get
+    shallow copies of the cached data frames and writing values copies the
+    modified columns, otherwise they get deep copies.
+    """
+    selection = columns is not None or rows is not None or where is not None
+    start, stop = _row_range(rows)
+    cache_key = key if datafile is None else (os.path.abspath(datafile), key)
+    if compact:
+        cache_key = (cache_key, 'compact')
+    with _lock:
+        if use_cache:
+            df = _cache_get(cache_key)
+            if df is not None:
+                if selection:
+                    return _share(_subset(df, columns, start, stop, where))
+                return _share(df)
+        if selection:
+            df = _read_subset(key, columns, start, stop, where, datafile)
+        elif _backend == 'npy' and datafile is None:
+            df = _read_npy(key)
+        else:
+            df = _open_store(datafile)[key]
+        if compact:
+            df = compact_frame(df)
+        if use_cache and not selection:
+            _cache_put(cache_key, df)
+            df = _share(df)
+    return df
+
+def _load(name, use_cache=False, columns=None, rows=None, where=None, compact=False):
+    """
+    Return the data frame(s) for the named dataset.
+
+    If use_cache is True the data frames are taken from the LRU cache if
+    present and stored in it otherwise.  In pandas copy-on-write mode cached
+    data frames share their buffers between callers.
+
+    For datasets consisting of several data frames the row range applies to
+    all of them, the columns only to the predictor frames.  The columns are
+    named as in the first predictor frame and select the columns at the same
+    positions in the others, e.g. 'xtrain.1' selects 'xtest.1' for Khan.
+    Queries are only supported for single data frame datasets.
+    """
+    keys = _registry[name]
+    if len(keys) == 1:
+        return _read(keys[0], use_cache, columns, rows, where, compact)
+    if where is not None:
+        raise ValueError(f'where queries are not supported for {name}, use select()')
+
+    selected = {key: None for key in keys}
+    if columns is not None:
+        predictors = [key for key in keys if key not in _label_keys]
+        names = {key: list(_read(key, False, rows=(0, 0)).columns) for key in predictors}
+        reference = names[predictors[0]]
+        missing = [column for column in columns if column not in reference]
+        if missing:
+            raise KeyError(f'{missing} not in the columns of {predictors[0]}')
+        positions = [reference.index(column) for column in columns]
+        for key in predictors:
+            selected[key] = [names[key][pos] for pos in positions]
+
+    return tuple(_read(key, use_cache, selected[key], rows, compact=compact)
+                 for key in keys)
+
+def _preload_hdf(datafile, key):
+    """Read key from datafile with a private handle, return frame and time."""
+    t0 = time.perf_counter()
+    with pd.HDFStore(datafile, 'r') as store:
+        df = store[key]
+    return df, time.perf_counter() - t0
+
+def _preload(names, workers):
+    keys = [(name, key) for name in names for key in _registry[name]]
+    results = {}
+
+    if _backend == 'npy' or workers <= 1:
+        # memory-mapping is cheap and in-process decoding avoids the start-up
+        # and pickling costs of a process pool
+        for name, key in keys:
+            t0 = time.perf_counter()
+            with _lock:
+                df = _read_npy(key) if _backend == 'npy' else _open_store()[key]
+            results[key] = (name, df, time.perf_counter() - t0)
+    else:
+        with futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            jobs = {pool.submit(_preload_hdf, _datafile, key): (name, key)
+                    for name, key in keys}
+            for job in futures.as_completed(jobs):
+                name, key = jobs[job]
+                df, seconds = job.result()
+                results[key] = (name, df, seconds)
+
+    rows = []
+    with _lock:
+        for name, key in keys:
+            name, df, seconds = results[key]
+            _cache_put(key, df)
+            rows.append((key, name, seconds, _nbytes(df), key in _cache))
+    report = pd.DataFrame(rows, columns=['key', 'dataset', 'seconds', 'nbytes', 'cached'])
+    return report.set_index('key')
+
+def preload(names=None, workers=None, background=False):
+    """
+    Load datasets into the cache.
+
+    The datasets in names (default: all, see names()) are decoded and stored
+    in the cache, so subsequent loads with use_cache=True are memory
+    lookups.  Datasets that do not fit into the cache are not kept, see
+    set_cache_size().
+
+    By default the datasets are decoded one after the other in this process.
+    With workers > 1 they are decoded concurrently in a pool of worker
+    processes.  Every worker imports pandas and PyTables and the frames are
+    pickled back to this process, which costs more than it saves for the
+    small shipped datasets.  Workers only pay off for large stores, e.g.
+    scaled() copies.  The npy backend always maps the files in this process.
+
+    Return a data frame with the decoding time in seconds, the size in bytes
+    and the cache status of every HDF store entry.  If background is True the
+    datasets are loaded in a background thread and a concurrent.futures.Future
+    of the data frame is returned instead.
+
+    Examples:
+
+        >>> report = datasets.preload(['Caravan', 'Khan'], workers=4)
+        >>> future = datasets.preload(background=True)
+    """
+    if names is None:
+        names = list(_registry)
+    elif isinstance(names, str):
+        names = [names]
+    if workers is None:
+        workers = 1
+
+    if background:
+        executor = futures.ThreadPoolExecutor(max_workers=1)
+        future = executor.submit(_preload, names, workers)
+        executor.shutdown(wait=False)
+        return future
+    return _preload(names, workers)
+
+def _nrows(key, datafile=None):
+    """Return the number of rows of the store entry key."""
+    if _backend == 'npy' and datafile is None:
+        with open(os.path.join(_npydir, key, 'schema.json')) as f:
+            return json.load(f)['nrows']
+    storer = _open_store(datafile).get_storer(key)
+    if storer.is_table:
+        return storer.nrows
+    # fixed format frames store the row index as axis1
+    return int(storer.group.axis1.shape[0])
+
+def iter_chunks(name, chunksize=10000, columns=None, where=None, as_array=False,
+                datafile=None):
+    """
+    Iterate over a dataset in chunks of at most chunksize rows.
+
+    Only one chunk is read into memory at a time.  The name is either the name
+    of a single data frame dataset or an HDF store entry such as
+    'Khan_xtrain'.  Only the given columns are read and the query where is
+    applied to every chunk (see select()).  If as_array is True the chunks are
+    yielded as NumPy arrays instead of data frames.  If datafile is given the
+    entry is read from that HDF file, for example one written by scaled().
+
+    Examples:
+
+        >>> for chunk in datasets.iter_chunks('Caravan', chunksize=1000):
+        ...     model.partial_fit(chunk.drop(columns='Purchase'), chunk['Purchase'])
+    """
+    keys = _registry.get(name, (name,))
+    if len(keys) > 1:
+        raise ValueError(f'{name} consists of several data frames, iterate over one of {keys}')
+    key = keys[0]
+
+    with _lock:
+        nrows = _nrows(key, datafile)
+    for start in range(0, nrows, chunksize):
+        with _lock:
+            chunk = _read_subset(key, columns, start, start + chunksize, where, datafile)
+        if as_array:
+            chunk = chunk.to_numpy()
+        yield chunk
+
+def select(key, columns=None, rows=None, where=None, use_cache=False, compact=False,
+           datafile=None):
+    """
+    Return a selection of the HDF store entry key.
+
+    Only the requested columns are returned.  The row selection rows can be a
+    slice or a (start, stop) pair of row positions.  The query where is a
+    boolean expression on the columns, for example 'mpg > 20 & cylinders == 4',
+    in the syntax of DataFrame.query().  The row range is applied before the
+    query.
+
+    Table format entries (see tools/data2h5.py) are queried on disk, so only
+    the requested data is read and decoded.  Entries of multi data frame
+    datasets are named like 'Khan_xtrain' or 'NCI60_labs'.  If datafile is
+    given the entry is read from that HDF file instead of HDFFilePath().
+
+    Examples:
+
+        >>> datasets.select('Caravan', columns=['MOSTYPE', 'Purchase'], rows=(0, 100))
+        >>> datasets.select('Auto', where='year > 80')
+    """
+    return _read(key, use_cache, columns, rows, where, compact, datafile)
+
+def as_arrays(name, target=None, features=None, dtype=np.float32, target_dtype=None,
+              rows=None, use_cache=False):
+    """
+    Return feature matrix and target vector of a dataset as NumPy arrays.
+
+    The name is either the name of a single data frame dataset or an HDF store
+    entry such as 'DigitsTrain'.  The features (default: all columns but the
+    target) must be numeric; encode categorical predictors first, for example
+    with utils.encode_categories().  If features are given, only they and the
+    target are read.  The feature matrix is returned as a C-contiguous array
+    of type dtype, filled column by column from the loaded data frame.  With
+    the npy backend the columns are memory-mapped and copied once, from HDF
+    entries they are decoded into the data frame first.
+
+    The target column is converted to target_dtype (default: dtype).  String
+    targets are returned as integer codes of their sorted categories.  If
+    target is None only the feature matrix is returned.
+
+    Examples:
+
+        >>> X, y = datasets.as_arrays('Boston', target='medv')
+        >>> X, y = datasets.as_arrays('DigitsTrain', target=0, target_dtype=np.int64)
+    """
+    keys = _registry.get(name, (name,))
+    if len(keys) > 1:
+        raise ValueError(f'{name} consists of several data frames, use one of {keys}')
+    columns = None
+    if features is not None:
+        columns = list(features)
+        if target is not None and target not in columns:
+            columns.append(target)
+    df = _read(keys[0], use_cache, columns, rows)
+
+    if features is None:
+        features = [col for col in df.columns if col != target]
+    X = np.empty((len(df), len(features)), dtype=dtype)
+    for j, col in enumerate(features):
+        values = df[col].to_numpy()
+        if values.dtype.kind not in 'biuf':
+            raise ValueError(f'feature {col!r} is not numeric, encode it first')
+        X[:, j] = values
+
+    if target is None:
+        return X
+
+    values = df[target].to_numpy()
+    if values.dtype.kind in 'biuf':
+        y = values.astype(target_dtype or dtype)
+    else:
+        codes, _ = pd.factorize(values, sort=True)
+        y = codes.astype(target_dtype or np.int64)
+    return X, y
+
+def as_tensors(name, target=None, features=None, dtype=np.float32, target_dtype=None,
+               rows=None, use_cache=False):
+    """
+    Return feature matrix and target vector of a dataset as torch tensors.
+
+    Same as as_arrays(), but the arrays are wrapped with torch.from_numpy()
+    without copying them.
+
+    Examples:
+
+        >>> X, y = datasets.as_tensors('Boston', target='medv')
+        >>> model = neuro.FCNN(layout=(X.shape[1], 32, 1))
+        >>> loss = fun.mse_loss(model(X).squeeze(), y)
+    """
+    import torch
+
+    arrays = as_arrays(name, target, features, dtype, target_dtype, rows, use_cache)
+    if target is None:
+        return torch.from_numpy(arrays)
+    return tuple(torch.from_numpy(array) for array in arrays)
+
+def scaled(name, n_rows, seed=None, datafile='isldata_scaled.h5', chunksize=1000000,
+           jitter=0.1):
+    """
+    Generate a scaled-up version of a dataset on disk.
+
+    The n_rows rows are drawn from the dataset with replacement, which keeps
+    the joint distribution of all columns, including the categorical ones.
+    Floating point columns are smoothed by adding Gaussian noise with a
+    standard deviation of jitter times the column's standard deviation,
+    clipped to the column's range.  Integer and categorical columns keep the
+    sampled values.  Columns are jittered independently, so exact functional
+    relations between float columns, such as wage and logwage in Wage, only
+    hold approximately.  The random numbers are drawn from a generator seeded
+    with seed.
+
+    The rows are generated and appended to the table format entry
+    '<name>_<n_rows>' of datafile in chunks of chunksize rows, so memory use
+    does not grow with n_rows.  An existing entry is replaced.  Return the
+    entry name, use it with iter_chunks() or select() and datafile.
+
+    Examples:
+
+        >>> key = datasets.scaled('Default', 10**7, seed=1)
+        >>> for chunk in datasets.iter_chunks(key, 10**6, datafile='isldata_scaled.h5'):
+        ...     model.partial_fit(chunk)
+    """
+    keys = _registry.get(name, (name,))
+    if len(keys) > 1:
+        raise ValueError(f'{name} consists of several data frames, scale one of {keys}')
+    df = _read(keys[0], use_cache=False)
+
+    rng = np.random.default_rng(seed)
+    floats = [col for col in df.columns if df[col].dtype.kind == 'f']
+    scale = jitter * df[floats].std().to_numpy()
+    lo, hi = df[floats].min().to_numpy(), df[floats].max().to_numpy()
+    strings = {col: int(df[col].str.len().max()) for col in df.columns
+               if df[col].dtype.kind == 'O'}
+
+    key = f'{name}_{n_rows}'
+    with _lock:
+        # drop our read-only handle, the file is opened for writing below
+        store = _stores.pop(datafile, (None, None))[0]
+        if store is not None:
+            store.close()
+        with pd.HDFStore(datafile, 'a') as store:
+            if key in store:
+                store.remove(key)
+            for start in range(0, n_rows, chunksize):
+                size = min(chunksize, n_rows - start)
+                chunk = df.take(rng.integers(0, len(df), size))
+                chunk.index = pd.RangeIndex(start, start + size)
+                if floats:
+                    noise = rng.normal(0, scale, (size, len(floats)))
+                    chunk[floats] = np.clip(chunk[floats].to_numpy() + noise, lo, hi)
+                store.append(key, chunk, min_itemsize=strings or None,
+                             data_columns=True, index=False)
+    return key
+
+def Advertising(use_cache=False, columns=None, rows=None, where=None, compact=False):
     """
     Return data frame for Advertising dataset.
 
@@ -57,14 +811,9 @@ def Advertising(use_cache=False):
 
             >>> auto = datasets.Advertising()
     """
-    global _advertising_ds
-    if not use_cache or _advertising_ds is None:
-        with pd.HDFStore(_datafile, 'r') as store:
-            _advertising_ds = store['Advertising']
-    return _advertising_ds
+    return _load('Advertising', use_cache, columns, rows, where, compact)
 
-_auto_ds = None
-def Auto(use_cache=False):
+def Auto(use_cache=False, columns=None, rows=None, where=None, compact=False):
     """
     Return data frame for Auto dataset.
 
@@ -113,14 +862,9 @@ def Auto(use_cache=False):
 
             >>> auto = datasets.Auto()
     """
-    global _auto_ds
-    if not use_cache or _auto_ds is None:
-        with pd.HDFStore(_datafile, 'r') as store:
-            _auto_ds = store['Auto']
-    return _auto_ds
+    return _load('Auto', use_cache, columns, rows, where, compact)
 
-_boston_ds = None
-def Boston(use_cache=False):
+def Boston(use_cache=False, columns=None, rows=None, where=None, compact=False):
     """
     Return data frame for Boston dataset.
 
@@ -178,14 +922,9 @@ def Boston(use_cache=False):
 
             >>> boston = datasets.Boston()
     """
-    global _boston_ds
-    if not use_cache or _boston_ds is None:
-        with pd.HDFStore(_datafile, 'r') as store:
-            _boston_ds = store['Boston']
-    return _boston_ds
+    return _load('Boston', use_cache, columns, rows, where, compact)
 
-_caravan_ds = None
-def Caravan(use_cache=False):
+def Caravan(use_cache=False, columns=None, rows=None, where=None, compact=False):
     """
     Return data frame for Caravan dataset.
 
@@ -229,14 +968,9 @@ def Caravan(use_cache=False):
 
         >>> caravan = datasets.Caravan()
     """
-    global _caravan_ds
-    if not use_cache or _caravan_ds is None:
-        with pd.HDFStore(_datafile, 'r') as store:
-            _caravan_ds = store['Caravan']
-    return _caravan_ds
+    return _load('Caravan', use_cache, columns, rows, where, compact)
 
-_carseats_ds = None
-def Carseats(use_cache=False):
+def Carseats(use_cache=False, columns=None, rows=None, where=None, compact=False):
     """
     Return data frame for Carseats dataset.
 
@@ -290,14 +1024,9 @@ def Carseats(use_cache=False):
 
         >>> carseats = datasets.Carseats()
     """
-    global _carseats_ds
-    if not use_cache or _carseats_ds is None:
-        with pd.HDFStore(_datafile, 'r') as store:
-            _carseats_ds = store['Carseats']
-    return _carseats_ds
+    return _load('Carseats', use_cache, columns, rows, where, compact)
 
-_credit_ds = None
-def Credit(use_cache=False):
+def Credit(use_cache=False, columns=None, rows=None, where=None, compact=False):
     """
     Return data frame for Credit dataset.
 
@@ -344,14 +1073,9 @@ def Credit(use_cache=False):
 
         >>> credit = datasets.Credit()
     """
-    global _credit_ds
-    if not use_cache or _credit_ds is None:
-        with pd.HDFStore(_datafile, 'r') as store:
-            _credit_ds = store['Credit']
-    return _credit_ds
+    return _load('Credit', use_cache, columns, rows, where, compact)
 
-_college_ds = None
-def College(use_cache=False):
+def College(use_cache=False, columns=None, rows=None, where=None, compact=False):
     """
     Return data frame for College dataset.
 
@@ -418,14 +1142,9 @@ def College(use_cache=False):
 
         >>> college = datasets.College()
     """
-    global _college_ds
-    if not use_cache or _college_ds is None:
-        with pd.HDFStore(_datafile, 'r') as store:
-            _college_ds = store['College']
-    return _college_ds
+    return _load('College', use_cache, columns, rows, where, compact)
 
-_default_ds = None
-def Default(use_cache=False):
+def Default(use_cache=False, columns=None, rows=None, where=None, compact=False):
     """
     Return data frame for Default dataset.
 
@@ -464,14 +1183,9 @@ def Default(use_cache=False):
 
         >>> default = datasets.Default()
     """
-    global _default_ds
-    if not use_cache or _default_ds is None:
-        with pd.HDFStore(_datafile, 'r') as store:
-            _default_ds = store['Default']
-    return _default_ds
+    return _load('Default', use_cache, columns, rows, where, compact)
 
-_hitters_ds = None
-def Hitters(use_cache=False):
+def Hitters(use_cache=False, columns=None, rows=None, where=None, compact=False):
     """
     Return data frame for Hitters dataset.
 
@@ -547,14 +1261,9 @@ def Hitters(use_cache=False):
 
         >>> hitters = datasets.Hitters()
     """
-    global _hitters_ds
-    if not use_cache or _hitters_ds is None:
-        with pd.HDFStore(_datafile, 'r') as store:
-            _hitters_ds = store['Hitters']
-    return _hitters_ds
+    return _load('Hitters', use_cache, columns, rows, where, compact)
 
-_khan_xtrain, _khan_ytrain, _khan_xtest, _khan_ytest = None, None, None, None
-def Khan(use_cache=False):
+def Khan(use_cache=False, columns=None, rows=None, compact=False):
     """
     Return data frames for Khan dataset.
 
@@ -599,18 +1308,14 @@ def Khan(use_cache=False):
     Examples:
 
         >>> xtrain, ytrain, xtest, ytest = datasets.Khan()
+
+    The columns are named as in xtrain and select the same genes in xtest:
+
+        >>> xtrain, ytrain, xtest, ytest = datasets.Khan(columns=['xtrain.1', 'xtrain.2'])
     """
-    global _khan_xtrain, _khan_ytrain, _khan_xtest, _khan_ytest
-    if not use_cache or _khan_xtrain is None:
-        with pd.HDFStore(_datafile, 'r') as store:
-            _khan_xtrain = store['Khan_xtrain']
-            _khan_ytrain = store['Khan_ytrain']
-            _khan_xtest = store['Khan_xtest']
-            _khan_ytest = store['Khan_ytest']
-    return _khan_xtrain, _khan_ytrain, _khan_xtest, _khan_ytest
+    return _load('Khan', use_cache, columns, rows, compact=compact)
 
-_nci60_data, _nci60_labs = None, None
-def NCI60(use_cache=False):
+def NCI60(use_cache=False, columns=None, rows=None, compact=False):
     """
     Return data frames for NCI60 dataset.
 
@@ -642,15 +1347,9 @@ def NCI60(use_cache=False):
 
         >>> data, labs = datasets.NCI60()
     """
-    global _nci60_data, _nci60_labs
-    if not use_cache or _nci60_data is None:
-        with pd.HDFStore(_datafile, 'r') as store:
-            _nci60_data = store['NCI60_data']
-            _nci60_labs = store['NCI60_labs']
-    return _nci60_data, _nci60_labs
+    return _load('NCI60', use_cache, columns, rows, compact=compact)
 
-_oj_ds = None
-def OJ(use_cache=False):
+def OJ(use_cache=False, columns=None, rows=None, where=None, compact=False):
     """
     Return data frame for OJ dataset.
 
@@ -718,14 +1417,9 @@ def OJ(use_cache=False):
 
         >>> oj = datasets.OJ()
     """
-    global _oj_ds
-    if not use_cache or _oj_ds is None:
-        with pd.HDFStore(_datafile, 'r') as store:
-            _oj_ds = store['OJ']
-    return _oj_ds
+    return _load('OJ', use_cache, columns, rows, where, compact)
 
-_portfolio_ds = None
-def Portfolio(use_cache=False):
+def Portfolio(use_cache=False, columns=None, rows=None, where=None, compact=False):
     """
     Return data frame for Portfolio dataset.
 
@@ -763,14 +1457,9 @@ def Portfolio(use_cache=False):
 
         >>> portf = datasets.Portfolio()
     """
-    global _portfolio_ds
-    if not use_cache or _portfolio_ds is None:
-        with pd.HDFStore(_datafile, 'r') as store:
-            _portfolio_ds = store['Portfolio']
-    return _portfolio_ds
+    return _load('Portfolio', use_cache, columns, rows, where, compact)
 
-_smarket_ds = None
-def Smarket(use_cache=False):
+def Smarket(use_cache=False, columns=None, rows=None, where=None, compact=False):
     """
     Return data frame for Smarket dataset.
 
@@ -819,14 +1508,9 @@ def Smarket(use_cache=False):
 
         >>> smarket = datasets.Smarket()
     """
-    global _smarket_ds
-    if not use_cache or _smarket_ds is None:
-        with pd.HDFStore(_datafile, 'r') as store:
-            _smarket_ds = store['Smarket']
-    return _smarket_ds
+    return _load('Smarket', use_cache, columns, rows, where, compact)
 
-_usarrests_ds = None
-def USArrests(use_cache=False):
+def USArrests(use_cache=False, columns=None, rows=None, where=None, compact=False):
     """
     Return data frame for USArrests dataset.
 
@@ -861,14 +1545,9 @@ def USArrests(use_cache=False):
 
         >>> arrests = datasets.USArrests()
     """
-    global _usarrests_ds
-    if not use_cache or _usarrests_ds is None:
-        with pd.HDFStore(_datafile, 'r') as store:
-            _usarrests_ds = store['USArrests']
-    return _usarrests_ds
+    return _load('USArrests', use_cache, columns, rows, where, compact)
 
-_wage_ds = None
-def Wage(use_cache=False):
+def Wage(use_cache=False, columns=None, rows=None, where=None, compact=False):
     """
     Return data frame for Wage dataset.
 
@@ -929,14 +1608,9 @@ def Wage(use_cache=False):
 
         >>> wage = datasets.Wage()
     """
-    global _wage_ds
-    if not use_cache or _wage_ds is None:
-        with pd.HDFStore(_datafile, 'r') as store:
-            _wage_ds = store['Wage']
-    return _wage_ds
+    return _load('Wage', use_cache, columns, rows, where, compact)
 
-_weekly_ds = None
-def Weekly(use_cache=False):
+def Weekly(use_cache=False, columns=None, rows=None, where=None, compact=False):
     """
     Return data frame for Weekly dataset.
 
@@ -985,14 +1659,9 @@ def Weekly(use_cache=False):
 
         >>> weekly = datasets.Weekly()
     """
-    global _weekly_ds
-    if not use_cache or _weekly_ds is None:
-        with pd.HDFStore(_datafile, 'r') as store:
-            _weekly_ds = store['Weekly']
-    return _weekly_ds
+    return _load('Weekly', use_cache, columns, rows, where, compact)
 
-_digit_train_ds, _digit_test_ds = None, None
-def Digits(use_cache=False):
+def Digits(use_cache=False, columns=None, rows=None, compact=False):
     """
     Return tuple of training and test data frames for Digits dataset.
 
@@ -1024,9 +1693,5 @@ def Digits(use_cache=False):
 
         >>> train, test = datasets.Digits()
     """
-    global _digit_train_ds, _digit_test_ds
-    if not use_cache or _digit_train_ds is None:
-        with pd.HDFStore(_datafile, 'r') as store:
-            _digit_train_ds, _digit_test_ds = store['DigitsTrain'], store['DigitsTest']
-    return _digit_train_ds, _digit_test_ds
+    return _load('Digits', use_cache, columns, rows, compact=compact)
 
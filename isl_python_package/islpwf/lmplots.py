@@ -16,20 +16,20 @@
 #  along with PWFML.  If not, see <https://www.gnu.org/licenses/>.
 #
 
+import weakref
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import axes3d
 import seaborn as sns
-from statsmodels.nonparametric import smoothers_lowess
-from statsmodels.graphics.gofplots import ProbPlot
 from islpwf import utils
 
+# mplot3d and statsmodels' ProbPlot are imported by the functions using them.
+
 
 def plot_fit(fitted_model, column, data=None,
              ax=None, points=100, scolor='C0', fcolor='C1', pcolor='C2', lcolor='C7',
              cialpha=0.3, pialpha=0.2, lalpha=0.8, lw=2,
-             show_ci=True, show_pi=False, lowess=False, legend=False):
+             show_ci=True, show_pi=False, lowess=False, legend=False, grid=None):
     """Make a scatter plot and overlay fit result.
     
     Make a scatter plot of the response versus a specified predictor and
@@ -37,6 +37,9 @@ def plot_fit(fitted_model, column, data=None,
     marginalised out, ie. they are set to the mean values of their respective
     distributions.
 
+    Pass a utils.MarginalGrid of the data as grid to reuse its column
+    statistics across several plots.
+
     Returns the matplot lib axis object the plot was drawn on.
     """
 
@@ -45,7 +48,9 @@ def plot_fit(fitted_model, column, data=None,
     if data is None:
         data = pd.DataFrame(model.exog, columns=model.exog_names)
 
-    xs = utils.marginalised_range(column, data, points=points)
+    if grid is None:
+        grid = utils.MarginalGrid(data)
+    xs = grid.range(column, points=points)
 
     pred = fitted_model.get_prediction(xs).summary_frame()
     x = xs[column]
@@ -82,11 +87,55 @@ def plot_fit(fitted_model, column, data=None,
     return ax
 
 
+def _predict_ci(fitted_model, design, alpha=0.05):
+    """Return mean and confidence interval bounds of the predictions for design.
+
+    For linear models the design matrix is built once and the interval
+    half-widths are computed from the parameter covariance for all rows at
+    once.  Other models, and formula models whose patsy design is not
+    available, use a single get_prediction() call.
+    """
+    from statsmodels.regression.linear_model import RegressionModel
+
+    model = fitted_model.model
+    exog = None
+    if isinstance(model, RegressionModel):
+        if getattr(model, 'formula', None) is None:
+            exog = design[model.exog_names].to_numpy()
+        else:
+            import patsy
+
+            # statsmodels keeps the patsy design as design_info or model_spec
+            design_info = getattr(model.data, 'design_info', None)
+            if design_info is None:
+                design_info = getattr(model.data, 'model_spec', None)
+            if isinstance(design_info, patsy.DesignInfo):
+                exog = np.asarray(patsy.build_design_matrices([design_info], design)[0])
+
+    if exog is None:
+        pred = fitted_model.get_prediction(design).summary_frame(alpha=alpha)
+        return (pred['mean'].to_numpy(), pred['mean_ci_lower'].to_numpy(),
+                pred['mean_ci_upper'].to_numpy())
+
+    params = np.asarray(fitted_model.params)
+    cov = np.asarray(fitted_model.cov_params())
+    mean = exog @ params
+    se = np.sqrt(np.einsum('ij,jk,ik->i', exog, cov, exog))
+    if fitted_model.use_t:
+        from scipy.stats import t
+        q = t.ppf(1 - alpha / 2, fitted_model.df_resid)
+    else:
+        from scipy.stats import norm
+        q = norm.ppf(1 - alpha / 2)
+
+    return mean, mean - q * se, mean + q * se
+
+
 def plot_fit_3D(fitted_model, column1, column2, 
                 data=None, points=100, 
                 scolor='C3', fcolor='C0', cicolor='C1', 
                 salpha=0.4, cialpha=0.2, cmap='Oranges', 
-                figsize=(12,9), show_ci=True):
+                figsize=(12,9), show_ci=True, grid=None):
     """Produce 3D scatter plot and overlay fitted model surface.
     
     
@@ -95,38 +144,31 @@ def plot_fit_3D(fitted_model, column1, column2,
     are marginalised out, ie. they are set to the mean values of their
     respective distributions.
 
+    Pass a utils.MarginalGrid of the data as grid to reuse its column
+    statistics across several plots.
+
     NOTE: This resets matplotlib graphics options to the defaults. 
 
     Returns the matplotlib figure and Axes3D objects.
     """
+    from mpl_toolkits.mplot3d import axes3d
 
     model = fitted_model.model
     
     if data is None:
         data = pd.DataFrame(model.exog, columns=model.exog_names)
 
-    marg = utils.marginalised_range((column1, column2), data, points=points)
+    if grid is None:
+        grid = utils.MarginalGrid(data)
+    xv, yv, design = grid.mesh(column1, column2, points=points)
     
     sns.reset_defaults()
 
     fig = plt.figure(figsize=figsize)
     ax = axes3d.Axes3D(fig)
 
-    # prepare point grids from the ranges of the scatter plot
-    xs = marg[column1] 
-    ys = marg[column2]
-    xv, yv = np.meshgrid(xs, ys)
-    zv = np.zeros((ys.size, xs.size))
-    lv = np.zeros((ys.size, xs.size))
-    uv = np.zeros((ys.size, xs.size))
-
-    # compute predictions and CI bounds for the rows in the point grids
-    for idx, y in enumerate(yv):
-        marg[column2] = y
-        pred = fitted_model.get_prediction(marg).summary_frame()
-        zv[idx] = pred['mean']
-        lv[idx] = pred['mean_ci_lower']
-        uv[idx] = pred['mean_ci_upper']
+    # compute predictions and CI bounds for all grid points in one pass
+    zv, lv, uv = (v.reshape(xv.shape) for v in _predict_ci(fitted_model, design))
 
     # 3D scatter plot of the raw data
     ax.scatter(data[column1], data[column2], model.endog, color=scolor)
@@ -157,12 +199,32 @@ def plot_fit_3D(fitted_model, column1, column2,
     return fig, ax
 
 
+_diagnostics = weakref.WeakKeyDictionary()
+
+
+def diagnostics(fitted_model):
+    """Return the influence diagnostics of the fitted model.
+
+    The result of fitted_model.get_influence() is memoised per results
+    instance.  Its residuals, leverages and Cook's distances are computed on
+    first use only, so all diagnostic plots of a model share them.
+    """
+    try:
+        return _diagnostics[fitted_model]
+    except KeyError:
+        influence = _diagnostics[fitted_model] = fitted_model.get_influence()
+        return influence
+    except TypeError:
+        # results that cannot be weakly referenced are not memoised
+        return fitted_model.get_influence()
+
+
 def glm_plot_resid(fitted_model, ax=None, scolor='C0', lcolor='C1', lw=2, lowess=True,
                    annotations=3):
     """Plot residuals versus fitted values."""
 
     values = fitted_model.fittedvalues
-    resids = pd.Series(fitted_model.get_influence().resid)
+    resids = pd.Series(diagnostics(fitted_model).resid)
 
     ax = sns.scatterplot(values, resids, color=scolor, ax=ax)
     ax.axhline(0, color=scolor, alpha=0.5)
@@ -231,6 +293,7 @@ def plot_resid(fitted_model, ax=None, scolor='C0', lcolor='C1', lw=2, lowess=Tru
 def glm_plot_qq(fitted_model, ax=None, scolor='C0', lcolor='C1', lw=2, line=True,
                 annotations=3):
     """Produce standard Q-Q plot."""
+    from statsmodels.graphics.gofplots import ProbPlot
     
     resids = fitted_model.resid_deviance
     pp = ProbPlot(resids)
@@ -258,8 +321,9 @@ def glm_plot_qq(fitted_model, ax=None, scolor='C0', lcolor='C1', lw=2, line=True
 def slm_plot_qq(fitted_model, ax=None, scolor='C0', lcolor='C1', lw=2, line=True,
                 annotations=3):
     """Produce standard Q-Q plot."""
+    from statsmodels.graphics.gofplots import ProbPlot
     
-    resids = fitted_model.get_influence().resid_studentized_internal
+    resids = diagnostics(fitted_model).resid_studentized_internal
     pp = ProbPlot(resids)
     
     ax = sns.scatterplot(pp.theoretical_quantiles, pp.sorted_data, 
@@ -331,7 +395,7 @@ def slm_plot_scaleloc(fitted_model, ax=None, scolor='C0', lcolor='C1', lw=2, low
                       annotations=3):
     """Produce scale-location plot."""
     
-    resids = np.sqrt(np.abs(fitted_model.get_influence().resid_studentized_internal))
+    resids = np.sqrt(np.abs(diagnostics(fitted_model).resid_studentized_internal))
     values = fitted_model.fittedvalues
     
     ax = sns.scatterplot(values, resids, ax=ax, color=scolor)
@@ -374,7 +438,7 @@ def glm_plot_leverage(fitted_model, ax=None, scolor='C0', lcolor='C1', ccolor='C
                       lowess=True, cook=True, legend=True, annotations=3):
     """Produce leverage plot."""
     
-    influence = fitted_model.get_influence()
+    influence = diagnostics(fitted_model)
     resids = fitted_model.resid_pearson
     values = influence.hat_matrix_diag
     cooks = influence.cooks_distance[0]
@@ -415,7 +479,7 @@ def slm_plot_leverage(fitted_model, ax=None, scolor='C0', lcolor='C1', ccolor='C
                       lowess=True, cook=True, legend=True, annotations=3):
     """Produce leverage plot."""
     
-    influence = fitted_model.get_influence()
+    influence = diagnostics(fitted_model)
     resids = influence.resid_studentized_internal
     values = influence.hat_matrix_diag
     cooks = influence.cooks_distance[0]
@@ -471,7 +535,7 @@ def plot_leverage(fitted_model, ax=None, scolor='C0', lcolor='C1', ccolor='C2',
 def plot_hat(fitted_model, ax=None, scolor='C0', annotations=3):
     """Make scatter plot of leverage vs index."""
 
-    influence = fitted_model.get_influence()
+    influence = diagnostics(fitted_model)
     ys = influence.hat_matrix_diag
     xs = np.arange(fitted_model.fittedvalues.index.size)
 
@@ -1,82 +1,194 @@
 import re
+import hashlib
+import warnings
+from collections import OrderedDict
 import numpy as np
 import pandas as pd
-import patsy
-import statsmodels.api as sm
-from statsmodels.nonparametric import smoothers_lowess
-from sklearn.base import BaseEstimator, RegressorMixin
-import matplotlib
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-
-class SMWrapper(BaseEstimator, RegressorMixin):
-    """ A universal sklearn-style wrapper for statsmodels regressors.
-    
-        Credit: 
-        
-            https://stackoverflow.com/users/6498293/david-dale
+
+# statsmodels, patsy, sklearn, matplotlib and seaborn take seconds to import,
+# they are imported by the functions that need them.
+
+
+def __getattr__(name):
+    # SMWrapper derives from sklearn classes, import it on first access
+    if name == 'SMWrapper':
+        from islpwf.wrappers import SMWrapper
+        return SMWrapper
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+class MarginalGrid:
+    """Grids over the range of columns with the other columns marginalised out.
+
+    The minimum, maximum and mean of all numeric columns of the data frame
+    are computed once at construction.  The grids are then built from these
+    statistics into preallocated arrays, so repeated grids over the same data,
+    e.g. for partial-effect sweeps over every predictor, are cheap.
     """
-    def __init__(self, model_class, fit_intercept=True):
-        self.model_class = model_class
-        self.fit_intercept = fit_intercept
-
-    def fit(self, X, y):
-        if self.fit_intercept:
-            X = sm.add_constant(X)
-        self.model_ = self.model_class(y, X)
-        self.results_ = self.model_.fit()
-    
-    def predict(self, X):
-        if self.fit_intercept:
-            X = sm.add_constant(X)
-       
-        return self.results_.predict(X)
+    def __init__(self, data):
+        self.data = data
+        self.names = data.columns
+        numeric = data.select_dtypes('number')
+        values = numeric.to_numpy(dtype=float)
+        # missing values are skipped and all-missing columns give NaN silently,
+        # as by the pandas reductions
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            stats = np.vstack([np.nanmin(values, axis=0), np.nanmax(values, axis=0),
+                               np.nanmean(values, axis=0)])
+        self.stats = pd.DataFrame(stats, index=['min', 'max', 'mean'], columns=numeric.columns)
+
+    def _columns(self, columns):
+        if isinstance(columns, str) or not np.iterable(columns):
+            return (columns,)
+        return tuple(columns)
+
+    def array(self, columns, points=100, others=None):
+        """Return C-contiguous (points x columns) array of the grid.
+
+        The columns in columns range from their minimum to their maximum, the
+        columns in others (default: all other columns) are set to their mean.
+        Columns in neither are not part of the array.
+        """
+        columns = self._columns(columns)
+        marginalised = [name for name in self.names if name not in columns and
+                        (others is None or name in self._columns(others))]
+        names = [name for name in self.names if name in columns or name in marginalised]
+
+        xs = np.empty((points, len(names)))
+        for j, name in enumerate(names):
+            if name in columns:
+                xs[:, j] = np.linspace(self.stats.at['min', name], self.stats.at['max', name], points)
+            else:
+                xs[:, j] = self.stats.at['mean', name]
+
+        return xs, names
+
+    def range(self, columns, points=100, others=None):
+        """Return data frame with range in columns and the other variables
+            marginalised out.
+
+        See array().  Columns that are neither in columns nor in others are
+        copied from the data.
+        """
+        xs, names = self.array(columns, points, others)
+        df = pd.DataFrame(xs, columns=names, copy=False)
+        for name in self.names:
+            if name not in names:
+                df[name] = self.data[name]
+
+        return df[self.names]
+
+    def mesh(self, column1, column2, points=100):
+        """Return meshgrid of two columns and the marginalised design on it.
+
+        Return the (points x points) meshgrids of column1 and column2 and a
+        data frame with one row per grid point in which the two columns take
+        the meshgrid values and all other columns are set to their mean.  The
+        rows are in the order of the raveled meshgrids.
+        """
+        xs, names = self.array((column1, column2), points)
+        xv, yv = np.meshgrid(xs[:, names.index(column1)], xs[:, names.index(column2)])
+
+        design = np.empty((points * points, len(names)))
+        design[:] = xs[0]
+        design[:, names.index(column1)] = xv.ravel()
+        design[:, names.index(column2)] = yv.ravel()
+
+        return xv, yv, pd.DataFrame(design, columns=names, copy=False)
 
 
 def marginalised_range(columns, data, points=100, others=None):
     """Return data frame with range in column column and 
         the other variables marginalised out.
+
+    Use a MarginalGrid to build several grids from the same data.
     """
 
-    names = data.columns
+    return MarginalGrid(data).range(columns, points, others)
 
-    xs = pd.DataFrame()
-    for name in names:
-        if name == columns or name in columns:
-            xs[name] = np.linspace(data[name].min(), data[name].max(), points)
-        elif others is not None and (name == others or name in others):
-            xs[name] = np.full(points, data[name].mean())
-        elif others is None:
-            xs[name] = np.full(points, data[name].mean())
-        else:
-            xs[name] = data[name]
 
-    return xs
+_lowess_cache = OrderedDict()
+_lowess_cache_size = 32
+
+
+def _stratified_sample(x, size, seed):
+    """Return indices of one random point per x-quantile stratum."""
+    order = np.argsort(x, kind='stable')
+    edges = np.linspace(0, len(x), size + 1).astype(int)
+    rng = np.random.default_rng(seed)
+    picks = edges[:-1] + (rng.random(size) * np.diff(edges)).astype(int)
+    return order[picks]
+
+
+def lowess(x, y, frac=2/3, it=3, delta='auto', max_points=10000, grid_points=None,
+           seed=0, cache=True):
+    """Compute y versus x LOWESS estimate.
+
+    The run time of LOWESS grows quadratically with the number of points.
+    For large inputs the estimate is therefore approximated:
+
+    - delta='auto' skips the local regressions for points closer than 1% of
+      the x range to the previous one if there are more than 5000 points,
+    - for more than max_points points a stratified subsample of max_points
+      points, one per x-quantile stratum, is smoothed instead,
+    - if grid_points is given, or when subsampling, the estimate is
+      interpolated to grid_points (default 200) equidistant x values.
+
+    The random subsample is drawn with the given seed.  If cache is True the
+    results are cached by the content of x and y and the parameters, so
+    repeated diagnostics plots of the same model are computed once.
+
+    Return x and y values of the estimate.
+    """
+    from statsmodels.nonparametric import smoothers_lowess
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    if cache:
+        digest = hashlib.blake2b(digest_size=16)
+        for array in (x, y):
+            digest.update(np.ascontiguousarray(array).view(np.uint8))
+        key = (digest.hexdigest(), x.size, frac, it, delta, max_points, grid_points, seed)
+        if key in _lowess_cache:
+            _lowess_cache.move_to_end(key)
+            return _lowess_cache[key]
+
+    valid = np.isfinite(x) & np.isfinite(y)
+    xs, ys = x[valid], y[valid]
+    if max_points is not None and xs.size > max_points:
+        idxs = _stratified_sample(xs, max_points, seed)
+        xs, ys = xs[idxs], ys[idxs]
+        if grid_points is None:
+            grid_points = 200
 
+    if delta == 'auto':
+        delta = 0.01 * np.ptp(xs) if xs.size > 5000 else 0.0
+    lfit = smoothers_lowess.lowess(ys, xs, frac=frac, it=it, delta=delta)
+    result = lfit[:, 0], lfit[:, 1]
 
-def lowess(x, y):
-    """Compute y versus x LOWESS estimate."""
+    if grid_points is not None:
+        xvals = np.linspace(lfit[0, 0], lfit[-1, 0], grid_points)
+        result = xvals, np.interp(xvals, lfit[:, 0], lfit[:, 1])
 
-    lfit = smoothers_lowess.lowess(y, x)
-    
-    return lfit[:, 0], lfit[:, 1]
+    if cache:
+        _lowess_cache[key] = result
+        while len(_lowess_cache) > _lowess_cache_size:
+            _lowess_cache.popitem(last=False)
 
+    return result
 
-def encode_categories(data, formula=None):
-    """Return new data frame with category encoding and flattened names."""
 
-    if formula is None:
-        formula = '+'.join(data.columns)
+def _flatten_names(names):
+    """Return dict of flattened names for patsy design matrix column names."""
 
     r_cat = re.compile(r'(?P<name>.+)\[(?P<trans>[TSDH]?)\.(?P<category>.+)\]') 
     r_cexp = re.compile(r'C\((?P<name>.+), .+\)') 
     r_poly = re.compile(r'C\((?P<name>.+), Poly.*\)\.(?P<category>.+)')
 
-    df = patsy.dmatrix(formula, data, return_type='dataframe')
-    
     new_names = {}
-    for name in df.columns:
+    for name in names:
         m_cat = r_cat.match(name)
         m_poly = r_poly.match(name)
         if m_cat:
@@ -94,17 +206,106 @@ def encode_categories(data, formula=None):
             new_name = m_poly['name'] + '_' + m_poly['category']
             new_names[name] = new_name
 
-    df.rename(new_names, axis=1, inplace=True)
-    try:
-        df.drop('Intercept', axis=1, inplace=True)
-    except KeyError:
-        pass
+    return new_names
+
+
+class CategoryEncoder:
+    """Reusable category encoder with flattened names.
+
+    fit() compiles the formula (default: all columns) on the given data into
+    a patsy design and computes the flattened column names once.  transform()
+    then encodes new batches of data, e.g. streamed chunks, with the learned
+    design, without parsing the formula or renaming columns again.  Category
+    levels not seen by fit() raise a patsy error.
+
+    If sparse is True transform() returns a scipy.sparse CSR matrix with the
+    columns named in the columns_ attribute.  The design is then built in
+    blocks of chunksize rows that are converted to CSR one at a time, so the
+    dense design matrix is never held in memory as a whole.  The CSR matrix
+    has no row index, so instead of dropping rows with missing values, as the
+    dense encoding does, the sparse encoding raises a patsy error for them.
+    Drop them first, e.g. with data.dropna().
+    """
+    def __init__(self, formula=None, sparse=False, chunksize=10000):
+        self.formula = formula
+        self.sparse = sparse
+        self.chunksize = chunksize
+
+    def fit(self, data):
+        import patsy
+
+        formula = self.formula
+        if formula is None:
+            formula = '+'.join(data.columns)
+
+        # only learn the design, the matrix is built by transform()
+        self.design_info_ = patsy.incr_dbuilder(formula, lambda: iter([data]))
+        names = self.design_info_.column_names
+        new_names = _flatten_names(names)
+        self.names_ = [new_names.get(name, name) for name in names]
+        self.keep_ = [j for j, name in enumerate(self.names_) if name != 'Intercept']
+        self.columns_ = pd.Index([self.names_[j] for j in self.keep_])
+
+        return self
+
+    def _encode(self, data):
+        import patsy
+
+        matrix, = patsy.build_design_matrices([self.design_info_], data,
+                                              NA_action='raise' if self.sparse else 'drop',
+                                              return_type='dataframe')
+        values = matrix.to_numpy()
+        if len(self.keep_) < values.shape[1]:
+            values = values[:, self.keep_]
+
+        return values, matrix.index
+
+    def transform(self, data):
+        """Return new data frame with category encoding and flattened names.
+
+        Return a scipy.sparse CSR matrix instead if the encoder is sparse.
+        """
+        if self.sparse:
+            from scipy import sparse
+
+            blocks = [sparse.csr_matrix(self._encode(data.iloc[start:start + self.chunksize])[0])
+                      for start in range(0, len(data), self.chunksize)]
+            if not blocks:
+                return sparse.csr_matrix((0, len(self.columns_)))
+            return sparse.vstack(blocks, format='csr')
+
+        values, index = self._encode(data)
+
+        return pd.DataFrame(values, index=index, columns=self.columns_, copy=False)
+
+    def fit_transform(self, data):
+        return self.fit(data).transform(data)
+
 
-    return df
+def encode_categories(data, formula=None, sparse=False):
+    """Return new data frame with category encoding and flattened names.
+
+    If sparse is True return a scipy.sparse CSR matrix and the list of
+    flattened column names instead.  Rows with missing values must then be
+    dropped beforehand, see CategoryEncoder.
+
+    Use a CategoryEncoder to encode several batches of data with the same
+    design.
+    """
+
+    encoder = CategoryEncoder(formula, sparse=sparse)
+    matrix = encoder.fit_transform(data)
+    if sparse:
+        return matrix, list(encoder.columns_)
+
+    return matrix
 
 
 def plot_corr(corr, figsize=(12, 10), cmap=None, labels=None):
     """Plot annotated correlation matrix for given data frame."""
+    import matplotlib
+    import matplotlib.pyplot as plt
+    import seaborn as sns
 
     mask = np.full_like(corr, False, dtype=bool)
     mask[np.triu_indices_from(mask)] = True
@@ -146,7 +347,16 @@ def plot_corr(corr, figsize=(12, 10), cmap=None, labels=None):
     return fig, ax
 
 
-def meshgrid_map(x1, x2, func, npoints=100):
+def _evaluate(func, xs, ys, stacked):
+    """Evaluate func on grid points as separate or stacked coordinates."""
+    if stacked:
+        z = func(np.c_[xs, ys])
+    else:
+        z = func(xs, ys)
+    return np.asarray(z).reshape((len(xs), -1))
+
+
+def meshgrid_map(x1, x2, func, npoints=100, batch_size=None, workers=None, pool='thread'):
     """Create a meshgrid and map a function on it.
 
     Create meshgrid of size npoints x npoints from ranges
@@ -155,21 +365,204 @@ def meshgrid_map(x1, x2, func, npoints=100):
     Then map the callable func on the grid, resulting in an array
     z with the same shape as the grid.
 
+    The callable is called with the x and y coordinates of the grid points
+    or, if that raises a TypeError or ValueError, with an (n x 2) array of
+    the points.  If batch_size is given the grid points are passed in
+    batches of at most batch_size points and the results are written into a
+    preallocated array.  The batches are evaluated by a pool of workers
+    threads (pool='thread') or processes (pool='process', func must be
+    picklable) if workers is greater than one.
+
     Return x, y, z of the grid
     """
     x1s = np.linspace(min(x1), max(x1), npoints)
     x2s = np.linspace(min(x2), max(x2), npoints)
     X, Y = np.meshgrid(x1s, x2s)
+    xs, ys = X.ravel(), Y.ravel()
+
+    if batch_size is None:
+        batch_size = xs.size
+
+    # the first batch determines the calling convention and the output width
+    stacked = False
     try:
-        z = func(X.ravel(), Y.ravel())
+        first = _evaluate(func, xs[:batch_size], ys[:batch_size], stacked)
     except (TypeError, ValueError):
-        z = func(np.c_[X.ravel(), Y.ravel()])
+        stacked = True
+        first = _evaluate(func, xs[:batch_size], ys[:batch_size], stacked)
+
+    z = np.empty((xs.size, first.shape[1]), dtype=first.dtype)
+    z[:batch_size] = first
+
+    starts = range(batch_size, xs.size, batch_size)
+    if workers is not None and workers > 1 and len(starts) > 0:
+        from concurrent import futures
+
+        if pool == 'process':
+            executor = futures.ProcessPoolExecutor(max_workers=workers)
+        else:
+            executor = futures.ThreadPoolExecutor(max_workers=workers)
+        with executor:
+            jobs = {start: executor.submit(_evaluate, func, xs[start:start + batch_size],
+                                           ys[start:start + batch_size], stacked)
+                    for start in starts}
+            for start, job in jobs.items():
+                z[start:start + batch_size] = job.result()
+    else:
+        for start in starts:
+            z[start:start + batch_size] = _evaluate(func, xs[start:start + batch_size],
+                                                    ys[start:start + batch_size], stacked)
 
     return X, Y, z.reshape((*X.shape, -1))
 
 
+def adaptive_meshgrid_map(x1, x2, func, npoints=100, levels=None, category=0, coarse=8):
+    """Create a meshgrid and map a function on it with adaptive resolution.
+
+    Same as meshgrid_map(), but func is first evaluated on a coarse subgrid of
+    about coarse x coarse cells only.  Cells whose corners agree on the argmax
+    of the output and, if levels is given, on the side of every level of the
+    output column category are filled by bilinear interpolation of their
+    corners.  The other cells are split into four and refined recursively
+    down to the full resolution, quadtree style.  Each refinement step
+    evaluates func once on all new points.
+
+    Structures smaller than the coarse cells can be missed.
+
+    Return x, y, z of the grid
+    """
+    x1s = np.linspace(min(x1), max(x1), npoints)
+    x2s = np.linspace(min(x2), max(x2), npoints)
+    X, Y = np.meshgrid(x1s, x2s)
+
+    def bounds(step):
+        return np.unique(np.r_[np.arange(0, npoints, step), npoints - 1])
+
+    step = 1
+    while (npoints - 1) // (2 * step) >= coarse:
+        step *= 2
+    b = bounds(step)
+    active = np.ones((len(b) - 1, len(b) - 1), dtype=bool)
+    evaluated = np.zeros((npoints, npoints), dtype=bool)
+    stacked = None
+    z = None
+
+    while True:
+        # evaluate the missing corners of all active cells in one call
+        iy, ix = np.nonzero(active)
+        todo = np.zeros_like(evaluated)
+        for dy in (0, 1):
+            for dx in (0, 1):
+                todo[b[iy + dy], b[ix + dx]] = True
+        todo &= ~evaluated
+        ry, rx = np.nonzero(todo)
+        if len(ry) > 0:
+            if stacked is None:
+                try:
+                    values = _evaluate(func, X[ry, rx], Y[ry, rx], False)
+                    stacked = False
+                except (TypeError, ValueError):
+                    values = _evaluate(func, X[ry, rx], Y[ry, rx], True)
+                    stacked = True
+            else:
+                values = _evaluate(func, X[ry, rx], Y[ry, rx], stacked)
+            if z is None:
+                z = np.empty((npoints, npoints, values.shape[1]), dtype=values.dtype)
+            z[ry, rx] = values
+            evaluated |= todo
+
+        if step == 1:
+            break
+
+        # corners in the order (y0, x0), (y0, x1), (y1, x0), (y1, x1)
+        zc = np.stack([z[b[iy + dy], b[ix + dx]] for dy in (0, 1) for dx in (0, 1)], axis=1)
+        cls = zc.argmax(axis=2)
+        agree = (cls == cls[:, :1]).all(axis=1)
+        if levels is not None:
+            zcat = zc[:, :, category if zc.shape[2] > 1 else 0]
+            for level in levels:
+                side = zcat > level
+                agree &= (side == side[:, :1]).all(axis=1)
+
+        for c in np.nonzero(agree)[0]:
+            y0, y1 = b[iy[c]], b[iy[c] + 1]
+            x0, x1 = b[ix[c]], b[ix[c] + 1]
+            ty = np.linspace(0, 1, y1 - y0 + 1)[:, None, None]
+            tx = np.linspace(0, 1, x1 - x0 + 1)[None, :, None]
+            z00, z01, z10, z11 = zc[c]
+            patch = (1 - ty) * ((1 - tx) * z00 + tx * z01) + ty * ((1 - tx) * z10 + tx * z11)
+            missing = ~evaluated[y0:y1 + 1, x0:x1 + 1]
+            z[y0:y1 + 1, x0:x1 + 1][missing] = patch[missing]
+
+        refine = np.zeros_like(active)
+        refine[iy[~agree], ix[~agree]] = True
+        step //= 2
+        nb = bounds(step)
+        parent = np.searchsorted(b, nb[:-1], side='right') - 1
+        active = refine[np.ix_(parent, parent)]
+        b = nb
+
+    return X, Y, z
+
+
+_grid_cache = OrderedDict()
+_grid_cache_size = 8
+
+
+def _grid_key(x1, x2, func, npoints, cache):
+    """Return the grid cache key of the caller's key cache.
+
+    The grids are keyed by the model func is bound to (or func itself), the
+    key given by the caller, the ranges and npoints.  The fitted state of a
+    model is not inspected, so the caller must pass a new key, e.g. a fit
+    counter, or call grid_cache_clear() after refitting a model in place.
+    """
+    owner = getattr(func, '__self__', func)
+    ranges = (float(min(x1)), float(max(x1)), float(min(x2)), float(max(x2)))
+    return (id(owner), cache, ranges, npoints)
+
+
+def grid_cache_clear():
+    """Clear the grid evaluations shared by the decision plots."""
+    _grid_cache.clear()
+
+
+def _cached_grid(x1, x2, predprob, npoints, adaptive, levels=None, category=0, cache=None):
+    """Return x, y, z of the (adaptive) grid, reusing cached evaluations.
+
+    A full resolution grid also serves adaptive requests over the same
+    ranges, so a decision boundary plot followed by contours of the same
+    model evaluates the model once.
+    """
+    key = None if cache is None else _grid_key(x1, x2, predprob, npoints, cache)
+    if key is None:
+        if adaptive:
+            return adaptive_meshgrid_map(x1, x2, predprob, npoints, levels=levels, category=category)
+        return meshgrid_map(x1, x2, predprob, npoints)
+
+    keys = [key + ('full',)]
+    if adaptive:
+        keys.append(key + ('adaptive', None if levels is None else tuple(levels), category))
+    for k in keys:
+        if k in _grid_cache:
+            _grid_cache.move_to_end(k)
+            return _grid_cache[k]
+
+    if adaptive:
+        grid = adaptive_meshgrid_map(x1, x2, predprob, npoints, levels=levels, category=category)
+    else:
+        grid = meshgrid_map(x1, x2, predprob, npoints)
+    for array in grid:
+        array.setflags(write=False)
+    _grid_cache[keys[-1]] = grid
+    while len(_grid_cache) > _grid_cache_size:
+        _grid_cache.popitem(last=False)
+
+    return grid
+
+
 def plot_decision_contour(x1, x2, predprob, npoints=100, category=0, ax=None, labels=True,
-        colors='black', levels=[0.5], alpha=0.7, fmt='%.2f'):
+        colors='black', levels=[0.5], alpha=0.7, fmt='%.2f', adaptive=False, cache=None):
     """Plot decision contours.
 
     Plot descision contours based on the predictors x1, x2 and the probabilities returned by
@@ -179,11 +572,21 @@ def plot_decision_contour(x1, x2, predprob, npoints=100, category=0, ax=None, la
 
     If labels is True (default) the contour lines are labeled inline.
 
+    If adaptive is True predprob is only evaluated at full resolution close
+    to the contours, see adaptive_meshgrid_map().
+
+    If cache is given, a hashable key such as a model name or fit counter,
+    the grid evaluation is shared with other decision plots of the same
+    predprob and key over the same ranges and npoints.  Pass a new key or
+    call grid_cache_clear() after refitting the model in place.
+
     The other keyword arguments are passed to matplotlib's contour() function.
 
     Return the axis the plot was drawn on.
     """
-    xs, ys, zs = meshgrid_map(x1, x2, predprob, npoints)
+    import matplotlib.pyplot as plt
+
+    xs, ys, zs = _cached_grid(x1, x2, predprob, npoints, adaptive, levels, category, cache)
     try:
         z = zs[:, :, category]
     except IndexError:
@@ -200,7 +603,8 @@ def plot_decision_contour(x1, x2, predprob, npoints=100, category=0, ax=None, la
     return cs.ax
 
 
-def plot_decision_boundaries(x1, x2, predprob, npoints=100, ax=None, cmap='Paired', alpha=0.1):
+def plot_decision_boundaries(x1, x2, predprob, npoints=100, ax=None, cmap='Paired', alpha=0.1,
+        adaptive=False, cache=None):
     """Plot decision boundaries.
 
     Plot descision contours based on the predictors x1, x2 and the probabilities returned by
@@ -208,11 +612,21 @@ def plot_decision_boundaries(x1, x2, predprob, npoints=100, ax=None, cmap='Paire
 
     If ax is None the plot goes onto the current default axis.
 
+    If adaptive is True predprob is only evaluated at full resolution close
+    to the decision boundaries, see adaptive_meshgrid_map().
+
+    If cache is given, a hashable key such as a model name or fit counter,
+    the grid evaluation is shared with other decision plots of the same
+    predprob and key over the same ranges and npoints.  Pass a new key or
+    call grid_cache_clear() after refitting the model in place.
+
     The other keyword arguments are passed to matplotlib's pcolormesh() function.
 
     Return the axis the plot was drawn on.
     """
-    xs, ys, zs = meshgrid_map(x1, x2, predprob, npoints)
+    import matplotlib.pyplot as plt
+
+    xs, ys, zs = _cached_grid(x1, x2, predprob, npoints, adaptive, cache=cache)
 
     z = zs.argmax(axis=2)
 
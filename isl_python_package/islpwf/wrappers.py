@@ -0,0 +1,144 @@
+#  Copyright (c) 2019 Kurt Rinnert <kurt.rinnert@cern.ch>
+#
+#  wrappers.py (this file) is part of  PWFML.
+#
+#  PWFML is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  PWFML is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with PWFML.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+import numpy as np
+import statsmodels.api as sm
+from sklearn.base import BaseEstimator, RegressorMixin
+
+from islpwf._design import constant_columns, scaled_cho_solve, scaled_cholesky
+
+
+def _matrix(X):
+    """Return X as ndarray without copying, sparse matrices are kept."""
+    if hasattr(X, 'tocsr'):
+        return X
+    return np.asarray(X, dtype=float)
+
+
+class SMWrapper(BaseEstimator, RegressorMixin):
+    """ A universal sklearn-style wrapper for statsmodels regressors.
+
+        If fast is True and model_class is sm.OLS the least squares solution
+        is computed from the Cholesky factorisation of the Gram matrix.  The
+        intercept is added to the Gram matrix and to the predictions, so X
+        is never copied, and it may also be a scipy.sparse matrix.  The
+        factorisation is kept in the cholesky_ attribute, the coefficients in
+        coef_ and intercept_.  The statsmodels model and results are only
+        computed on first access of model_ or results_.  Ill-conditioned
+        problems fall back to the statsmodels fit.
+
+        Credit: 
+        
+            https://stackoverflow.com/users/6498293/david-dale
+    """
+    # reciprocal condition number of the scaled Gram matrix below which the
+    # fast fit falls back to statsmodels
+    rcond = 1e-10
+
+    def __init__(self, model_class, fit_intercept=True, fast=False):
+        self.model_class = model_class
+        self.fit_intercept = fit_intercept
+        self.fast = fast
+
+    def fit(self, X, y):
+        self.cholesky_ = None
+        self._data = None
+        if self.fast and self.model_class is sm.OLS and self._fit_fast(X, y):
+            return self
+
+        if self.fit_intercept:
+            X = sm.add_constant(X)
+        self._model = self.model_class(y, X)
+        self._results = self._model.fit()
+
+        return self
+
+    def _fit_fast(self, X, y):
+        Xm = _matrix(X)
+        ys = np.asarray(y, dtype=float)
+        intercept = self.fit_intercept and not constant_columns(Xm).any()
+
+        gram = Xm.T @ Xm
+        xty = Xm.T @ ys
+        if hasattr(gram, 'toarray'):
+            gram = gram.toarray()
+        xty = np.asarray(xty).ravel()
+        if intercept:
+            sums = np.asarray(Xm.sum(axis=0)).ravel()
+            gram = np.block([[np.array([[Xm.shape[0]]]), sums[None, :]],
+                             [sums[:, None], gram]])
+            xty = np.r_[ys.sum(), xty]
+
+        try:
+            factor, scale = scaled_cholesky(gram)
+        except np.linalg.LinAlgError:
+            return False
+        diag = np.diag(factor)
+        if (diag.min() / diag.max())**2 < self.rcond:
+            return False
+
+        params = scaled_cho_solve(factor, scale, xty)
+        self.cholesky_ = (factor, scale)
+        self.gram_ = gram
+        self.xty_ = xty
+        self.params_ = params
+        self.intercept_ = params[0] if intercept else 0.0
+        self.coef_ = params[1:] if intercept else params
+        self._data = (X, y)
+        self._model = None
+        self._results = None
+
+        return True
+
+    @property
+    def model_(self):
+        if self._model is None and self._data is not None:
+            X, y = self._data
+            if hasattr(X, 'toarray'):
+                X = X.toarray()
+            if self.fit_intercept:
+                X = sm.add_constant(X)
+            self._model = self.model_class(y, X)
+        return self._model
+
+    @property
+    def results_(self):
+        if self._results is None and self._data is not None:
+            self._results = self.model_.fit()
+        return self._results
+
+    def predict(self, X):
+        if getattr(self, 'cholesky_', None) is not None:
+            return np.asarray(_matrix(X) @ self.coef_).ravel() + self.intercept_
+
+        if self.fit_intercept:
+            X = sm.add_constant(X)
+       
+        return self.results_.predict(X)
+
+    def predict_batches(self, blocks):
+        """Predict many blocks of X.
+
+        A 3-dimensional array of blocks of equal size is predicted in one
+        matrix product, returning a (blocks x rows) array.  Otherwise a list
+        of the predictions for every block is returned.
+        """
+        if getattr(self, 'cholesky_', None) is not None and getattr(blocks, 'ndim', 0) == 3:
+            return np.asarray(blocks, dtype=float) @ self.coef_ + self.intercept_
+
+        return [self.predict(X) for X in blocks]
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark storage layouts for the datasets in isldata.h5.
+
+Every dataset in isldata.h5 (see data2h5.py) is written to a separate file
+for each layout: fixed and table format, uncompressed and with several blosc
+codecs and levels, and as memory-mapped column files (see
+islpwf.datasets.export_npy()).  For every layout and dataset the file size is
+recorded and a fresh Python process loads the dataset through the
+islpwf.datasets loaders to measure
+
+    cold_seconds    the first load in the process, including opening the file
+    warm_seconds    the median of further uncached loads
+    peak_rss_bytes  the peak resident memory of the process
+    base_rss_bytes  the peak resident memory before the first load
+
+The OS page cache is not dropped, so cold loads measure decoding rather than
+disk access.  The results are written as a JSON list of records, layouts that
+cannot store a dataset get a record with an error message instead.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import pandas as pd
+
+hdf_file = 'isldata.h5'
+
+codecs = [(None, 0)] + [(complib, level)
+                        for complib in ('blosc:zstd', 'blosc:lz4', 'blosc:blosclz')
+                        for level in (1, 5, 9)]
+
+def layouts():
+    for fmt in ('fixed', 'table'):
+        for complib, complevel in codecs:
+            name = f'{fmt}-{complib or "none"}-{complevel}'
+            yield {'layout': name, 'format': fmt, 'complib': complib, 'complevel': complevel}
+    yield {'layout': 'npy', 'format': 'npy', 'complib': None, 'complevel': 0}
+
+def dir_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, fname))
+               for root, _, fnames in os.walk(path) for fname in fnames)
+
+def write(df, key, layout, directory):
+    """Write df in the given layout, return the path and environment to load it."""
+    from islpwf import datasets
+
+    path = os.path.join(directory, f'{layout["layout"]}-{key}.h5')
+    if layout['format'] == 'npy':
+        tmp = path + '.tmp'
+        with pd.HDFStore(tmp, 'w') as store:
+            store.put(key, df)
+        path = os.path.join(directory, f'npy-{key}')
+        datasets.export_npy(path, keys=[key], hdf_file=tmp)
+        os.remove(tmp)
+        return path, {'ISLPWF_BACKEND': 'npy', 'ISLPWF_NPYDIR': path}
+
+    with pd.HDFStore(path, 'w', complib=layout['complib'], complevel=layout['complevel']) as store:
+        store.put(key, df, format=layout['format'])
+    return path, {'ISLPWF_BACKEND': 'hdf5', 'ISLPWF_DATAFILE': path}
+
+def peak_rss():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+def measure(key, repeat):
+    """Load key through the loaders in this process and print the timings."""
+    from islpwf import datasets
+
+    base_rss = peak_rss()
+    t0 = time.perf_counter()
+    datasets.select(key)
+    cold = time.perf_counter() - t0
+
+    warm = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        datasets.select(key)
+        warm.append(time.perf_counter() - t0)
+    print(json.dumps({
+        'cold_seconds': cold,
+        'warm_seconds': sorted(warm)[len(warm) // 2] if warm else None,
+        'peak_rss_bytes': peak_rss(),
+        'base_rss_bytes': base_rss,
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--keys', nargs='+', help='store entries to benchmark (default: all)')
+    parser.add_argument('--layouts', nargs='+', help='layouts to benchmark (default: all)')
+    parser.add_argument('--repeat', type=int, default=5, help='number of warm loads')
+    parser.add_argument('--output', default='store_benchmark.json', help='JSON report file')
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure, args.repeat)
+        return
+
+    with pd.HDFStore(hdf_file, 'r') as store:
+        keys = args.keys or [key.lstrip('/') for key in store.keys()]
+        frames = {key: store[key] for key in keys}
+
+    records = []
+    with tempfile.TemporaryDirectory() as directory:
+        for layout in layouts():
+            if args.layouts and layout['layout'] not in args.layouts:
+                continue
+            for key, df in frames.items():
+                t0 = time.perf_counter()
+                try:
+                    path, env = write(df, key, layout, directory)
+                except Exception as e:
+                    # e.g. tables too wide for the table format attributes
+                    records.append(dict(layout, key=key, error=f'{type(e).__name__}: {str(e).splitlines()[-1].strip()}'))
+                    print(f'{layout["layout"]:24} {key:16} failed: {records[-1]["error"]}')
+                    continue
+                write_seconds = time.perf_counter() - t0
+
+                result = subprocess.run(
+                    [sys.executable, __file__, '--measure', key, '--repeat', str(args.repeat)],
+                    env=dict(os.environ, **env), capture_output=True, text=True, check=True)
+                record = dict(layout, key=key, file_bytes=dir_size(path),
+                              write_seconds=write_seconds)
+                record.update(json.loads(result.stdout.splitlines()[-1]))
+                records.append(record)
+                print(f'{layout["layout"]:24} {key:16} {record["file_bytes"]:>10} bytes  '
+                      f'cold {record["cold_seconds"]:.4f}s  warm {record["warm_seconds"]:.4f}s')
+
+    with open(args.output, 'w') as f:
+        json.dump(records, f, indent=1)
+
+if __name__ == '__main__':
+    main()
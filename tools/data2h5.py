@@ -1,22 +1,103 @@
 #!/usr/bin/env python3
-import pandas as pd
+"""
+Pack the .csv and .dat files in the current directory into isldata.h5.
+
+By default only datasets whose source files changed since the last run are
+parsed, in parallel, and rewritten.  The SHA-256 of the source file and the
+parse and write timings are recorded in the attributes of every store entry.
+Use --full to rebuild the file from scratch, which also reclaims the space of
+rewritten entries.
+"""
+import argparse
+import hashlib
 import os
+import time
+from concurrent import futures
+import pandas as pd
 
 hdf_file = 'isldata.h5'
-try:
-    os.remove(hdf_file)
-except FileNotFoundError:
-    pass
-
-with pd.HDFStore(hdf_file, complevel=9, complib='blosc:zstd') as store:
-    for fname in os.listdir('./'):
-        if fname.endswith('.csv'):
-            print(fname)
-            df = pd.read_csv(fname)
-            dfname = os.path.splitext(fname)[0]
-            store[dfname] = df
-        if fname.endswith('.dat'):
-            print(fname)
-            df = pd.read_csv(fname, header=None, sep='\s+')
-            dfname = os.path.splitext(fname)[0]
-            store[dfname] = df
+
+# Tables up to this width are written in the queryable table format with all
+# columns as data columns, so the loaders can select columns and rows on disk.
+# The columns are not indexed, the PyTables indexes would more than double the
+# size of the file and slow down full loads.  Wider tables are written in the
+# faster fixed format.
+max_table_columns = 100
+
+def sha256(fname):
+    digest = hashlib.sha256()
+    with open(fname, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def parse(fname):
+    t0 = time.perf_counter()
+    if fname.endswith('.dat'):
+        df = pd.read_csv(fname, header=None, sep=r'\s+')
+    else:
+        df = pd.read_csv(fname)
+    return df, time.perf_counter() - t0
+
+def put(store, dfname, df):
+    if df.shape[1] <= max_table_columns:
+        store.put(dfname, df, format='table', data_columns=True, index=False)
+    else:
+        store.put(dfname, df)
+
+def recorded_sources(store):
+    sources = {}
+    for key in store.keys():
+        source = getattr(store.get_storer(key).attrs, 'islpwf_source', None)
+        if source is not None:
+            sources[key.lstrip('/')] = source
+    return sources
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--full', action='store_true', help='rebuild all datasets')
+    parser.add_argument('--workers', type=int, default=None, help='number of parser processes')
+    args = parser.parse_args()
+
+    if args.full:
+        try:
+            os.remove(hdf_file)
+        except FileNotFoundError:
+            pass
+
+    sources = {os.path.splitext(fname)[0]: fname
+               for fname in sorted(os.listdir('./'))
+               if fname.endswith('.csv') or fname.endswith('.dat')}
+
+    with pd.HDFStore(hdf_file, 'a', complevel=9, complib='blosc:zstd') as store:
+        recorded = recorded_sources(store)
+
+        for dfname in sorted(set(recorded) - set(sources)):
+            print(f'{dfname}: source removed')
+            store.remove(dfname)
+
+        hashes = {dfname: sha256(fname) for dfname, fname in sources.items()}
+        changed = [dfname for dfname in sources
+                   if recorded.get(dfname, {}).get('sha256') != hashes[dfname]]
+
+        with futures.ProcessPoolExecutor(max_workers=args.workers) as pool:
+            jobs = {pool.submit(parse, sources[dfname]): dfname for dfname in changed}
+            for job in futures.as_completed(jobs):
+                dfname = jobs[job]
+                df, parse_seconds = job.result()
+                t0 = time.perf_counter()
+                put(store, dfname, df)
+                write_seconds = time.perf_counter() - t0
+                store.get_storer(dfname).attrs.islpwf_source = {
+                    'file': sources[dfname],
+                    'sha256': hashes[dfname],
+                    'parse_seconds': parse_seconds,
+                    'write_seconds': write_seconds,
+                    'built': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                }
+                print(f'{sources[dfname]}: parsed in {parse_seconds:.2f}s, written in {write_seconds:.2f}s')
+
+        print(f'{len(changed)} of {len(sources)} datasets rebuilt')
+
+if __name__ == '__main__':
+    main()
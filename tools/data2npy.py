@@ -0,0 +1,6 @@
+#!/usr/bin/env python3
+# Export the datasets in isldata.h5 (see data2h5.py) to uncompressed,
+# memory-mappable column files in isldata/ for the 'npy' backend.
+from islpwf import datasets
+
+datasets.export_npy('isldata', hdf_file='isldata.h5')
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Check the import time of the islpwf modules against a budget.
+
+Every module is imported in a fresh interpreter with 'python -X importtime'.
+The check fails if the cumulative import time exceeds the module's budget or
+if the import pulls in one of the heavy dependencies that the module only
+needs on first use of some of its functions.
+"""
+import argparse
+import subprocess
+import sys
+
+# module: (budget in seconds, modules that must not be imported)
+budgets = {
+    'islpwf.datasets': (1.0, ['tables', 'statsmodels', 'sklearn', 'matplotlib', 'torch']),
+    'islpwf.utils': (1.0, ['patsy', 'statsmodels', 'sklearn', 'matplotlib', 'seaborn']),
+    # matplotlib and seaborn already load mplot3d and the bare statsmodels package
+    'islpwf.lmplots': (5.0, ['statsmodels.api', 'statsmodels.graphics.gofplots', 'sklearn']),
+}
+
+def check(module, budget, forbidden):
+    code = (f'import sys, {module}\n'
+            f'print(*[m for m in {forbidden!r} if m in sys.modules])')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True)
+    cumulative = None
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == module:
+            cumulative = int(fields[1]) / 1e6
+    imported = result.stdout.split()
+
+    failed = result.returncode != 0
+    ok = not failed and cumulative is not None and cumulative <= budget and not imported
+    # the module is missing from the timings if the import failed
+    seconds = '    n/a' if cumulative is None else f'{cumulative:6.3f}s'
+    print(f'{module:16} {seconds} (budget {budget:.1f}s)'
+          + (f'  imports {", ".join(imported)}' if imported else '')
+          + (f'  {result.stderr.strip().splitlines()[-1]}' if failed else '')
+          + ('' if ok else '  FAILED'))
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('modules', nargs='*', help='modules to check (default: all)')
+    args = parser.parse_args()
+
+    results = [check(module, *budgets[module]) for module in args.modules or budgets]
+    sys.exit(0 if all(results) else 1)
+
+if __name__ == '__main__':
+    main()